@@ -1,8 +1,11 @@
 from flask import Flask, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 import os
+import json
+import cv2
+import numpy as np
 from werkzeug.utils import secure_filename
-from ocr_processor import OCRProcessor
+from ocr_processor import OCRProcessor, OCR_PROFILES, QUALITY_MODES, DEFAULT_QUALITY_MODE, parse_page_ranges
 from data_converter import DataConverter
 
 app = Flask(__name__, static_folder='static')
@@ -10,7 +13,7 @@ CORS(app)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'tiff'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'tiff', 'tif'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 
@@ -47,31 +50,62 @@ def upload_file():
     
     file = request.files['file']
     data_type = request.form.get('data_type', 'auto')
+    # Niveau vitesse/qualité : fast (aperçu), balanced, accurate
+    mode = request.form.get('mode', DEFAULT_QUALITY_MODE)
+    if mode not in QUALITY_MODES:
+        return jsonify({'error': f"Mode invalide: {mode} (attendu: {', '.join(QUALITY_MODES)})"}), 400
+    # Pages à traiter pour les PDF et TIFF multipages, ex. « 1-5,12 »
+    pages = request.form.get('pages') or None
+    try:
+        parse_page_ranges(pages)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if file.filename == '':
         return jsonify({'error': 'Aucun fichier sélectionné'}), 400
     
+    # Options OCR par requête
+    ocr_options = {}
+    try:
+        if request.form.get('max_parallel_pages'):
+            ocr_options['max_parallel_pages'] = int(request.form['max_parallel_pages'])
+        if request.form.get('deskew'):
+            ocr_options['deskew'] = request.form['deskew'].lower() not in ('0', 'false', 'non')
+        if request.form.get('near_duplicates'):
+            # Désactivation par requête de la réutilisation des rescans quasi identiques
+            ocr_options['near_duplicates'] = request.form['near_duplicates'].lower() not in ('0', 'false', 'non')
+    except ValueError:
+        return jsonify({'error': 'Option OCR invalide'}), 400
+    
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Les images sont décodées directement depuis la mémoire ;
+        # seuls les PDF passent par le disque (rastérisation par poppler)
+        file_bytes = file.read()
+        if filename.lower().endswith('.pdf'):
+            with open(filepath, 'wb') as f:
+                f.write(file_bytes)
         
         try:
             # Traitement OCR
             print(f"🔍 Début du traitement OCR pour {filename}")
-            extracted_data = ocr_processor.process_file(filepath, data_type)
+            extracted_data = ocr_processor.process_file(filepath, data_type, file_bytes=file_bytes, mode=mode,
+                                                        pages=pages, **ocr_options)
             print(f"✅ OCR terminé, type détecté: {extracted_data.get('detected_type', 'unknown')}")
             
             # Conversion selon le format demandé
             output_format = request.form.get('format', 'csv')
             print(f"🔄 Conversion en format {output_format}")
-            output_data = data_converter.convert_data(extracted_data, output_format)
+            output_data = data_converter.convert_data(extracted_data, output_format, source=file_bytes)
             
             return jsonify({
                 'success': True,
                 'data': extracted_data,
                 'download_url': f'/download/{output_data}',
-                'detected_type': extracted_data.get('detected_type', 'unknown')
+                'detected_type': extracted_data.get('detected_type', 'unknown'),
+                'mode': mode,
+                'timings': extracted_data.get('ocr', {}).get('timings', {})
             })
             
         except Exception as e:
@@ -104,19 +138,20 @@ def download_converted_file(filename):
 
 @app.route('/api/data_types')
 def get_available_data_types():
-    """Route unique pour les types de données"""
-    return jsonify({
-        'data_types': [
-            {'id': 'auto', 'name': '🔍 Détection automatique'},
-            {'id': 'budget', 'name': '💰 Budget d\'investissement'},
-            {'id': 'laboratoire', 'name': '🔬 Données Laboratoires'},
-            {'id': 'voirie', 'name': '🛣️ Voirie et Réseaux Divers'},
-            {'id': 'formation', 'name': '📚 Documents de formation'},
-            {'id': 'legal', 'name': '⚖️ Documents juridiques'},
-            {'id': 'administrative', 'name': '📋 Documents administratifs'},
-            {'id': 'tabular', 'name': '📊 Données tabulaires'}
-        ]
-    })
+    """Route unique pour les types de données (avec le profil OCR appliqué à chacun)"""
+    data_types = [
+        {'id': 'auto', 'name': '🔍 Détection automatique'},
+        {'id': 'budget', 'name': '💰 Budget d\'investissement'},
+        {'id': 'laboratoire', 'name': '🔬 Données Laboratoires'},
+        {'id': 'voirie', 'name': '🛣️ Voirie et Réseaux Divers'},
+        {'id': 'formation', 'name': '📚 Documents de formation'},
+        {'id': 'legal', 'name': '⚖️ Documents juridiques'},
+        {'id': 'administrative', 'name': '📋 Documents administratifs'},
+        {'id': 'tabular', 'name': '📊 Données tabulaires'}
+    ]
+    for data_type in data_types:
+        data_type['ocr_profile'] = OCR_PROFILES.get(data_type['id'])
+    return jsonify({'data_types': data_types})
 
 @app.route('/api/formats')
 def get_available_formats():
@@ -132,10 +167,58 @@ def get_available_formats():
             {'id': 'xml', 'name': 'XML'},
             {'id': 'html', 'name': 'HTML'},
             {'id': 'docx', 'name': 'Word (.docx)'},
-            {'id': 'txt', 'name': 'Texte (.txt)'}
+            {'id': 'txt', 'name': 'Texte (.txt)'},
+            {'id': 'hocr', 'name': 'hOCR (mots avec boîtes et confiances)'},
+            {'id': 'alto', 'name': 'ALTO XML'},
+            {'id': 'tsv', 'name': 'TSV (mots avec boîtes et confiances)'},
+            {'id': 'pdf', 'name': 'PDF interrogeable (couche texte invisible)'}
         ]
     })
 
+@app.route('/api/cache_stats')
+def get_cache_stats():
+    """Statistiques du cache OCR (hits/misses, occupation)"""
+    if ocr_processor.cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **ocr_processor.cache.stats()})
+
+@app.route('/api/scheduler')
+def get_scheduler():
+    """Répartition des cœurs de ce worker : budget, threads OpenMP, épinglage"""
+    return jsonify(ocr_processor.scheduler.describe())
+
+@app.route('/api/templates', methods=['GET'])
+def list_form_templates():
+    """Modèles de formulaires enregistrés"""
+    if ocr_processor.templates is None:
+        return jsonify({'enabled': False, 'templates': []})
+    return jsonify({'enabled': True, 'templates': ocr_processor.templates.list()})
+
+@app.route('/api/templates', methods=['POST'])
+def register_form_template():
+    """Enregistre un formulaire de référence : image + nom + champs JSON [{"name", "bbox": [x0, y0, x1, y1]}]"""
+    if ocr_processor.templates is None:
+        return jsonify({'error': 'Modèles de formulaires désactivés'}), 503
+    if 'file' not in request.files or not request.form.get('name'):
+        return jsonify({'error': 'Image de référence et nom du modèle requis'}), 400
+    
+    gray = cv2.imdecode(np.frombuffer(request.files['file'].read(), np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return jsonify({'error': 'Image de référence illisible'}), 400
+    try:
+        fields = json.loads(request.form.get('fields', '[]'))
+        template = ocr_processor.templates.register(
+            request.form['name'], gray, fields, request.form.get('data_type', 'administrative'))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f'Modèle invalide: {e}'}), 400
+    return jsonify({'success': True, 'template': template})
+
+@app.route('/api/templates/<name>', methods=['DELETE'])
+def delete_form_template(name):
+    if ocr_processor.templates is None or not ocr_processor.templates.delete(name):
+        return jsonify({'error': 'Modèle non trouvé'}), 404
+    return jsonify({'success': True})
+
 @app.route('/health')
 def health_check():
     return jsonify({
@@ -145,6 +228,9 @@ def health_check():
             "/upload": "POST - Upload de fichiers",
             "/api/data_types": "GET - Types de données disponibles",
             "/api/formats": "GET - Formats de sortie disponibles",
+            "/api/cache_stats": "GET - Statistiques du cache OCR",
+            "/api/scheduler": "GET - Répartition des cœurs (pages, blocs, OpenMP)",
+            "/api/templates": "GET/POST - Modèles de formulaires (DELETE /api/templates/<nom>)",
             "/download/<filename>": "GET - Téléchargement",
             "/health": "GET - Statut du serveur"
         }
@@ -1,18 +1,27 @@
 import pandas as pd
+import numpy as np
 import os
+import io
 import json
+from html import escape
+
+# Extensions des fichiers exportés lorsqu'elles diffèrent de l'identifiant du format
+FORMAT_EXTENSIONS = {'alto': 'alto.xml'}
 
 class DataConverter:
     def __init__(self):
         self.output_dir = 'converted'
         os.makedirs(self.output_dir, exist_ok=True)
     
-    def convert_data(self, data, output_format):
-        """Convertit les données dans le format demandé"""
+    def convert_data(self, data, output_format, source=None):
+        """Convertit les données dans le format demandé
+        
+        source : fichier d'origine (chemin ou contenu), requis pour le PDF interrogeable
+        """
         print(f"🔄 Conversion demandée: format {output_format}")
         print(f"📊 Données reçues: {type(data)}")
         
-        filename = f"exported_data.{output_format}"
+        filename = f"exported_data.{FORMAT_EXTENSIONS.get(output_format, output_format)}"
         filepath = os.path.join(self.output_dir, filename)
         
         print(f"💾 Fichier de sortie: {filepath}")
@@ -42,6 +51,14 @@ class DataConverter:
                 result = self._to_xml(data, filepath)
             elif output_format == 'html':
                 result = self._to_html(data, filepath)
+            elif output_format == 'hocr':
+                result = self._to_hocr(data, filepath)
+            elif output_format == 'alto':
+                result = self._to_alto(data, filepath)
+            elif output_format == 'tsv':
+                result = self._to_tsv(data, filepath)
+            elif output_format == 'pdf':
+                result = self._to_searchable_pdf(data, filepath, source)
             else:
                 # Fallback vers CSV
                 result = self._to_csv(data, filepath)
@@ -380,6 +397,274 @@ class DataConverter:
             print(f"❌ Erreur conversion HTML: {e}")
             return False
     
+    def _ocr_word_pages(self, data):
+        """Pages OCR (pleine page ou zones d'un formulaire reconnu) avec leurs mots conservés par OCRProcessor"""
+        pages = data.get('ocr', {}).get('pages', []) if isinstance(data, dict) else []
+        return [page for page in pages if page.get('source') in ('ocr', 'template')]
+    
+    def _group_ocr_words(self, words):
+        """Regroupe les mots en blocs > paragraphes > lignes, chaque niveau avec sa boîte englobante"""
+        def bbox(items):
+            return (min(i['left'] for i in items), min(i['top'] for i in items),
+                    max(i['left'] + i['width'] for i in items), max(i['top'] + i['height'] for i in items))
+        
+        blocks = {}
+        for word in words:
+            lines = blocks.setdefault(word['block'], {}).setdefault(word['par'], {})
+            lines.setdefault(word['line'], []).append(word)
+        
+        grouped = []
+        for block in blocks.values():
+            pars = []
+            for par in block.values():
+                lines = [{'bbox': bbox(line_words), 'words': line_words} for line_words in par.values()]
+                pars.append({'bbox': bbox([w for line in lines for w in line['words']]), 'lines': lines})
+            grouped.append({'bbox': bbox([w for par in pars for line in par['lines'] for w in line['words']]),
+                            'pars': pars})
+        return grouped
+    
+    def _to_hocr(self, data, filepath):
+        """Conversion en hOCR (XHTML avec boîtes et confiances par mot)"""
+        try:
+            lines_out = [
+                '<?xml version="1.0" encoding="UTF-8"?>',
+                '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+                '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">',
+                '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="fr" lang="fr">',
+                '<head>',
+                '  <title>Données Extraites</title>',
+                '  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>',
+                '  <meta name="ocr-system" content="tesseract"/>',
+                '  <meta name="ocr-capabilities" content="ocr_page ocr_carea ocr_par ocr_line ocrx_word"/>',
+                '</head>',
+                '<body>',
+            ]
+            
+            def box(b):
+                return f'bbox {b[0]} {b[1]} {b[2]} {b[3]}'
+            
+            for page in self._ocr_word_pages(data):
+                n = page['page']
+                lines_out.append(f"  <div class='ocr_page' id='page_{n}' "
+                                 f"title='{box((0, 0, page.get('width', 0), page.get('height', 0)))}; ppageno {n - 1}'>")
+                for b, block in enumerate(self._group_ocr_words(page.get('words', [])), start=1):
+                    lines_out.append(f"   <div class='ocr_carea' id='block_{n}_{b}' title='{box(block['bbox'])}'>")
+                    for p, par in enumerate(block['pars'], start=1):
+                        lines_out.append(f"    <p class='ocr_par' id='par_{n}_{b}_{p}' title='{box(par['bbox'])}'>")
+                        for l, line in enumerate(par['lines'], start=1):
+                            spans = ' '.join(
+                                f"<span class='ocrx_word' id='word_{n}_{b}_{p}_{l}_{w}' "
+                                f"title='{box((word['left'], word['top'], word['left'] + word['width'], word['top'] + word['height']))}; "
+                                f"x_wconf {max(0, int(round(word['conf'])))}'>{escape(word['text'])}</span>"
+                                for w, word in enumerate(line['words'], start=1)
+                            )
+                            lines_out.append(f"     <span class='ocr_line' id='line_{n}_{b}_{p}_{l}' "
+                                             f"title='{box(line['bbox'])}'>{spans}</span>")
+                        lines_out.append('    </p>')
+                    lines_out.append('   </div>')
+                lines_out.append('  </div>')
+            
+            lines_out += ['</body>', '</html>']
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines_out) + '\n')
+            return True
+        except Exception as e:
+            print(f"❌ Erreur conversion hOCR: {e}")
+            return False
+    
+    def _to_alto(self, data, filepath):
+        """Conversion en ALTO XML v4 (positions en pixels, confiance par mot)"""
+        try:
+            def position(b):
+                return f'HPOS="{b[0]}" VPOS="{b[1]}" WIDTH="{b[2] - b[0]}" HEIGHT="{b[3] - b[1]}"'
+            
+            lines_out = [
+                '<?xml version="1.0" encoding="UTF-8"?>',
+                '<alto xmlns="http://www.loc.gov/standards/alto/ns-v4#" '
+                'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:schemaLocation="http://www.loc.gov/standards/alto/ns-v4# '
+                'http://www.loc.gov/alto/v4/alto-4-2.xsd">',
+                '  <Description>',
+                '    <MeasurementUnit>pixel</MeasurementUnit>',
+                '    <OCRProcessing ID="OCR_0"><ocrProcessingStep><processingSoftware>'
+                '<softwareName>tesseract</softwareName></processingSoftware></ocrProcessingStep></OCRProcessing>',
+                '  </Description>',
+                '  <Layout>',
+            ]
+            for page in self._ocr_word_pages(data):
+                n = page['page']
+                width, height = page.get('width', 0), page.get('height', 0)
+                lines_out.append(f'    <Page ID="page_{n}" PHYSICAL_IMG_NR="{n}" WIDTH="{width}" HEIGHT="{height}">')
+                lines_out.append(f'      <PrintSpace {position((0, 0, width, height))}>')
+                for b, block in enumerate(self._group_ocr_words(page.get('words', [])), start=1):
+                    lines_out.append(f'        <TextBlock ID="block_{n}_{b}" {position(block["bbox"])}>')
+                    for p, par in enumerate(block['pars'], start=1):
+                        for l, line in enumerate(par['lines'], start=1):
+                            strings = '<SP/>'.join(
+                                f'<String ID="string_{n}_{b}_{p}_{l}_{w}" '
+                                f'{position((word["left"], word["top"], word["left"] + word["width"], word["top"] + word["height"]))} '
+                                f'WC="{max(0.0, word["conf"]) / 100:.2f}" CONTENT="{escape(word["text"], quote=True)}"/>'
+                                for w, word in enumerate(line['words'], start=1)
+                            )
+                            lines_out.append(f'          <TextLine ID="line_{n}_{b}_{p}_{l}" {position(line["bbox"])}>'
+                                             f'{strings}</TextLine>')
+                    lines_out.append('        </TextBlock>')
+                lines_out.append('      </PrintSpace>')
+                lines_out.append('    </Page>')
+            lines_out += ['  </Layout>', '</alto>']
+            
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines_out) + '\n')
+            return True
+        except Exception as e:
+            print(f"❌ Erreur conversion ALTO: {e}")
+            return False
+    
+    def _to_tsv(self, data, filepath):
+        """Conversion en TSV au format Tesseract (une ligne par page et par mot)"""
+        try:
+            columns = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                       'left', 'top', 'width', 'height', 'conf', 'text']
+            rows = ['\t'.join(columns)]
+            for page in self._ocr_word_pages(data):
+                n = page['page']
+                rows.append(f"1\t{n}\t0\t0\t0\t0\t0\t0\t{page.get('width', 0)}\t{page.get('height', 0)}\t-1\t")
+                word_num = {}
+                for word in page.get('words', []):
+                    line_key = (word['block'], word['par'], word['line'])
+                    word_num[line_key] = word_num.get(line_key, 0) + 1
+                    text = word['text'].replace('\t', ' ')
+                    rows.append(f"5\t{n}\t{word['block']}\t{word['par']}\t{word['line']}\t{word_num[line_key]}\t"
+                                f"{word['left']}\t{word['top']}\t{word['width']}\t{word['height']}\t"
+                                f"{word['conf']:g}\t{text}")
+            
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(rows) + '\n')
+            return True
+        except Exception as e:
+            print(f"❌ Erreur conversion TSV: {e}")
+            return False
+    
+    def _to_searchable_pdf(self, data, filepath, source):
+        """PDF interrogeable : pages d'origine + couche texte invisible tirée des boîtes de mots déjà calculées
+        
+        Aucun OCR n'est relancé : les mots (et leur repère) viennent du rapport OCR,
+        éventuellement servi par le cache.
+        """
+        try:
+            from pypdf import PdfReader, PdfWriter
+            
+            if source is None:
+                print("⚠️ PDF interrogeable: fichier d'origine non fourni")
+                return False
+            content = source if isinstance(source, (bytes, bytearray)) else open(source, 'rb').read()
+            if not content.startswith(b'%PDF'):
+                content = self._images_to_pdf(content)
+            
+            reader = PdfReader(io.BytesIO(content))
+            writer = PdfWriter()
+            ocr_pages = {page['page']: page for page in self._ocr_word_pages(data)}
+            
+            for number, page in enumerate(reader.pages, start=1):
+                ocr_page = ocr_pages.get(number)
+                if ocr_page and ocr_page.get('words'):
+                    page.merge_page(self._text_layer_page(ocr_page, float(page.mediabox.width),
+                                                          float(page.mediabox.height)))
+                writer.add_page(page)
+            
+            with open(filepath, 'wb') as f:
+                writer.write(f)
+            return True
+        except Exception as e:
+            print(f"❌ Erreur conversion PDF interrogeable: {e}")
+            return False
+    
+    def _images_to_pdf(self, content):
+        """Image(s) d'origine (toutes les pages d'un TIFF) en PDF, une page par image"""
+        from PIL import Image, ImageOps, ImageSequence
+        
+        image = Image.open(io.BytesIO(content))
+        frames = [frame.convert('RGB') if frame.mode not in ('L', 'RGB') else frame.copy()
+                  for frame in ImageSequence.Iterator(image)]
+        if len(frames) == 1:
+            # Même repère que l'OCR : cv2 applique l'orientation EXIF des images simples (photos de téléphone)
+            frames = [ImageOps.exif_transpose(image).convert(frames[0].mode)]
+        # TIFF sans unité de résolution : (1, 1) annoncé, page de plusieurs mètres sinon
+        dpi = float(image.info.get('dpi', (300, 300))[0])
+        buffer = io.BytesIO()
+        frames[0].save(buffer, format='PDF', save_all=True, append_images=frames[1:],
+                       resolution=dpi if dpi >= 72 else 300.0)
+        return buffer.getvalue()
+    
+    def _text_layer_page(self, ocr_page, page_width, page_height):
+        """Page de même taille ne contenant que le texte invisible (mode de rendu 3) aux positions des mots"""
+        from pypdf import PageObject
+        from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+        
+        width, height = ocr_page.get('width', 0), ocr_page.get('height', 0)
+        rotate = ocr_page.get('orientation', 0)
+        # Repère de l'image d'origine (avant la rotation appliquée pour l'OCR)
+        source_width, source_height = (height, width) if rotate in (90, 270) else (width, height)
+        scale_x, scale_y = page_width / source_width, page_height / source_height
+        
+        # Inverse du redressement de l'inclinaison (rotation autour du centre appliquée avant l'OCR)
+        deskew = ocr_page.get('deskew_matrix')
+        inverse = np.linalg.inv(np.vstack([deskew, [0.0, 0.0, 1.0]]))[:2] if deskew else None
+        
+        operations = []
+        words = ocr_page['words']
+        for index, word in enumerate(words):
+            if inverse is not None:
+                word = self._unskew_box(word, inverse)
+            x0, y0, x1, y1 = self._unrotate_box(word, rotate, width, height)
+            font_size = max(1.0, (y1 - y0) * scale_y)
+            # Espace final entre mots d'une même ligne : le texte copié ou extrait reste séparé
+            line_key = (word['block'], word['par'], word['line'])
+            following = words[index + 1] if index + 1 < len(words) else None
+            same_line = following is not None and (following['block'], following['par'], following['line']) == line_key
+            text = (word['text'] + (' ' if same_line else '')).encode('cp1252', errors='replace')
+            text = text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+            # Largeur approximative Helvetica (0,5 em par caractère) ajustée par mise à l'échelle horizontale
+            horizontal_scale = 100.0 * (x1 - x0) * scale_x / max(1.0, 0.5 * font_size * len(text))
+            operations.append(
+                b'BT 3 Tr /FOCR %.2f Tf %.1f Tz 1 0 0 1 %.2f %.2f Tm (%s) Tj ET'
+                % (font_size, horizontal_scale, x0 * scale_x, page_height - y1 * scale_y, text)
+            )
+        
+        overlay = PageObject.create_blank_page(width=page_width, height=page_height)
+        font = DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'),
+            NameObject('/Subtype'): NameObject('/Type1'),
+            NameObject('/BaseFont'): NameObject('/Helvetica'),
+            NameObject('/Encoding'): NameObject('/WinAnsiEncoding'),
+        })
+        overlay[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/FOCR'): font})
+        })
+        stream = DecodedStreamObject()
+        stream.set_data(b'\n'.join(operations))
+        overlay[NameObject('/Contents')] = stream
+        return overlay
+    
+    def _unskew_box(self, word, inverse):
+        """Boîte d'un mot déplacée par l'inverse du redressement (centre transformé, taille conservée)"""
+        center_x = word['left'] + word['width'] / 2.0
+        center_y = word['top'] + word['height'] / 2.0
+        x, y = inverse @ np.array([center_x, center_y, 1.0])
+        return {**word, 'left': x - word['width'] / 2.0, 'top': y - word['height'] / 2.0}
+    
+    def _unrotate_box(self, word, rotate, width, height):
+        """Boîte d'un mot ramenée du repère OCR (page tournée de `rotate` degrés horaires) au repère d'origine"""
+        x0, y0 = word['left'], word['top']
+        x1, y1 = x0 + word['width'], y0 + word['height']
+        if rotate == 90:
+            return y0, width - x1, y1, width - x0
+        if rotate == 180:
+            return width - x1, height - y1, width - x0, height - y0
+        if rotate == 270:
+            return height - y1, x0, height - y0, x1
+        return x0, y0, x1, y1
+    
     def _universal_to_dataframe(self, data):
         """Convertit n'importe quelle structure de données en DataFrame"""
         if isinstance(data, dict) and data.get('type') == 'universal':
@@ -678,6 +963,11 @@ class DataConverter:
         
         return pd.DataFrame(rows) if rows else pd.DataFrame({'Message': ['Aucune donnée administrative']})
     
+    def _form_to_df(self, data):
+        """Convertit les champs d'un formulaire reconnu par modèle en DataFrame"""
+        rows = [{'Champ': name, 'Valeur': value} for name, value in data.get('fields', {}).items()]
+        return pd.DataFrame(rows) if rows else pd.DataFrame({'Message': ['Aucun champ de formulaire']})
+    
     def _generic_to_df(self, data):
         """Convertit les données génériques en DataFrame"""
         # Vérifier d'abord le type spécifique
@@ -701,6 +991,8 @@ class DataConverter:
                 return self._legal_to_df(data)
             elif data_type == 'administrative':
                 return self._administrative_to_df(data)
+            elif data_type == 'form':
+                return self._form_to_df(data)
         
         # Fallback pour les données génériques
         if isinstance(data, dict) and 'lines' in data:
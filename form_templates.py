@@ -0,0 +1,185 @@
+"""Modèles de formulaires récurrents (formulaires administratifs).
+
+Un modèle = points d'ancrage (ORB sur une vignette de la page de référence)
++ zones de champs nommées. Une page reconnue est recalée sur le modèle par
+homographie : seules les zones des champs passent par l'OCR
+(voir OCRProcessor._process_form_template).
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+THUMBNAIL_SIDE = 1000
+ORB_FEATURES = 1500
+MIN_ANCHORS = 50
+
+
+def _features(gray) -> Tuple[np.ndarray, Optional[np.ndarray], float]:
+    """Points ORB (coordonnées pleine résolution), descripteurs et échelle de la vignette"""
+    scale = min(1.0, THUMBNAIL_SIDE / max(gray.shape[:2]))
+    thumbnail = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    keypoints, descriptors = cv2.ORB_create(nfeatures=ORB_FEATURES).detectAndCompute(thumbnail, None)
+    points = np.float32([kp.pt for kp in keypoints]).reshape(-1, 2) / scale
+    return points, descriptors, scale
+
+
+def field_crop(gray, field: Dict[str, Any], homography: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Zone d'un champ redressée dans le repère du modèle ; retourne (image, matrice zone -> page)"""
+    x0, y0, x1, y1 = field['bbox']
+    to_page = homography @ np.array([[1, 0, x0], [0, 1, y0], [0, 0, 1]], dtype=np.float64)
+    crop = cv2.warpPerspective(gray, to_page, (x1 - x0, y1 - y0),
+                               flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderValue=255)
+    return crop, to_page
+
+
+def map_box(box: Tuple[int, int, int, int], matrix: np.ndarray) -> Tuple[int, int, int, int]:
+    """Boîte englobante (x0, y0, x1, y1) d'une boîte transformée par une homographie"""
+    x0, y0, x1, y1 = box
+    corners = np.float32([[x0, y0], [x1, y0], [x1, y1], [x0, y1]]).reshape(-1, 1, 2)
+    mapped = cv2.perspectiveTransform(corners, matrix).reshape(-1, 2)
+    (left, top), (right, bottom) = mapped.min(axis=0), mapped.max(axis=0)
+    return int(round(left)), int(round(top)), int(round(right)), int(round(bottom))
+
+
+class FormTemplateStore:
+    """Modèles enregistrés sur disque (un fichier JSON par modèle), partagés entre workers"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get('OCR_TEMPLATES_PATH', os.path.join('cache', 'form_templates'))
+        os.makedirs(self.path, exist_ok=True)
+        self._templates = {}
+        self._loaded_version = None
+        self._reload_if_changed()
+
+    @property
+    def version(self) -> str:
+        """Change à chaque ajout, remplacement ou suppression de modèle (identique d'un worker à l'autre)"""
+        entries = sorted(
+            (entry.name, entry.stat().st_mtime_ns) for entry in os.scandir(self.path) if entry.name.endswith('.json')
+        )
+        return hashlib.sha256(repr(entries).encode('utf-8')).hexdigest()
+
+    def _reload_if_changed(self):
+        # Un autre worker a pu enregistrer ou supprimer un modèle
+        version = self.version
+        if version == self._loaded_version:
+            return
+        templates = {}
+        for filename in sorted(os.listdir(self.path)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.path, filename), encoding='utf-8') as f:
+                    template = json.load(f)
+                template['points'] = np.float32(template['points']).reshape(-1, 2)
+                template['descriptors'] = np.frombuffer(
+                    base64.b64decode(template['descriptors']), np.uint8).reshape(len(template['points']), -1)
+                templates[template['name']] = template
+            except Exception as e:
+                print(f"⚠️ Modèle de formulaire illisible ({filename}): {e}")
+        self._templates = templates
+        self._loaded_version = version
+
+    def _describe(self, template: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'name': template['name'],
+            'data_type': template['data_type'],
+            'width': template['width'],
+            'height': template['height'],
+            'anchors': len(template['points']),
+            'fields': template['fields'],
+        }
+
+    def __len__(self) -> int:
+        self._reload_if_changed()
+        return len(self._templates)
+
+    def list(self) -> List[Dict[str, Any]]:
+        self._reload_if_changed()
+        return [self._describe(t) for t in self._templates.values()]
+
+    def register(self, name: str, gray, fields: List[Dict[str, Any]],
+                 data_type: str = 'administrative') -> Dict[str, Any]:
+        """Enregistre un formulaire de référence et ses zones de champs (en pixels de l'image de référence)"""
+        if not re.fullmatch(r'[\w-]{1,64}', name):
+            raise ValueError("Nom de modèle invalide (lettres, chiffres, _ et - uniquement)")
+        height, width = gray.shape[:2]
+
+        clean_fields = []
+        for field in fields:
+            x0, y0, x1, y1 = (int(v) for v in field['bbox'])
+            x0, y0, x1, y1 = max(0, x0), max(0, y0), min(width, x1), min(height, y1)
+            if not field.get('name') or x1 <= x0 or y1 <= y0:
+                raise ValueError(f"Champ invalide: {field}")
+            clean_fields.append({
+                'name': str(field['name']),
+                'bbox': [x0, y0, x1, y1],
+                'psm': int(field.get('psm', 7)),
+                'whitelist': field.get('whitelist'),
+            })
+        if not clean_fields:
+            raise ValueError("Aucun champ défini")
+
+        points, descriptors, _ = _features(gray)
+        if descriptors is None or len(points) < MIN_ANCHORS:
+            raise ValueError("Pas assez de points d'ancrage sur l'image de référence")
+
+        template = {
+            'name': name,
+            'data_type': data_type,
+            'width': width,
+            'height': height,
+            'fields': clean_fields,
+            'points': points.tolist(),
+            'descriptors': base64.b64encode(descriptors.tobytes()).decode('ascii'),
+        }
+        with open(os.path.join(self.path, f'{name}.json'), 'w', encoding='utf-8') as f:
+            json.dump(template, f, ensure_ascii=False)
+        self._loaded_version = None
+        self._reload_if_changed()
+        print(f"✅ Modèle de formulaire enregistré: {name} ({len(points)} ancres, {len(clean_fields)} champs)")
+        return self._describe(self._templates[name])
+
+    def delete(self, name: str) -> bool:
+        path = os.path.join(self.path, f'{name}.json')
+        if not re.fullmatch(r'[\w-]{1,64}', name) or not os.path.exists(path):
+            return False
+        os.remove(path)
+        self._reload_if_changed()
+        return True
+
+    def match(self, gray, min_inliers: int = 40) -> Optional[Dict[str, Any]]:
+        """Modèle reconnu sur la page : correspondances ORB + homographie RANSAC (modèle -> page)"""
+        self._reload_if_changed()
+        if not self._templates:
+            return None
+
+        points, descriptors, scale = _features(gray)
+        if descriptors is None or len(points) < MIN_ANCHORS:
+            return None
+
+        matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        best = None
+        for template in self._templates.values():
+            pairs = matcher.knnMatch(template['descriptors'], descriptors, k=2)
+            # Test du rapport de Lowe : ancres sans ambiguïté uniquement
+            good = [p[0] for p in pairs if len(p) == 2 and p[0].distance < 0.75 * p[1].distance]
+            if len(good) < min_inliers:
+                continue
+
+            source = template['points'][[m.queryIdx for m in good]]
+            target = points[[m.trainIdx for m in good]]
+            homography, mask = cv2.findHomography(source, target, cv2.RANSAC, 3.0 / scale)
+            if homography is None or np.linalg.det(homography[:2, :2]) <= 0:
+                continue
+            inliers = int(mask.sum())
+            if inliers >= min_inliers and (best is None or inliers > best['inliers']):
+                best = {'template': template, 'homography': homography,
+                        'inliers': inliers, 'matches': len(good)}
+        return best
@@ -0,0 +1,298 @@
+"""Cache disque des résultats OCR, partagé par tous les workers d'un nœud.
+
+Stockage SQLite (un fichier local, accès concurrent entre processus) avec
+taille maximale, éviction LRU et compteurs de hits/misses par espace de noms.
+Un index d'empreintes perceptuelles retrouve les pages quasi identiques
+(même page rescannée avec une autre exposition ou un léger décalage) ; chaque
+candidat est vérifié tuile par tuile sur une image binarisée fine.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from typing import Dict, Any, Optional, Tuple
+
+
+def hash_file(filepath: str) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """Empreinte SHA-256 d'un contenu déjà en mémoire"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_image(image) -> str:
+    """Empreinte SHA-256 des pixels d'une image (tableau NumPy), forme et type compris"""
+    import numpy as np
+    pixels = np.ascontiguousarray(image)
+    digest = hashlib.sha256(f'{pixels.shape}{pixels.dtype}'.encode('utf-8'))
+    digest.update(memoryview(pixels).cast('B'))
+    return digest.hexdigest()
+
+
+# Empreinte perceptuelle : dHash 16x16 (256 bits), découpé en bandes pour l'index
+PHASH_SIZE = 16
+PHASH_BANDS = 8
+# Vérification : page binarisée assez fine pour distinguer un chiffre (ou une virgule) d'un autre
+SIGNATURE_WIDTH = 2048
+SIGNATURE_TILE = 64
+SIGNATURE_MISMATCH = SIGNATURE_TILE * SIGNATURE_TILE  # Pages non comparables
+MAX_VERIFIED_CANDIDATES = 5
+
+
+def perceptual_hash(gray) -> str:
+    """dHash de la page (signe des gradients horizontaux), insensible à l'exposition ; hexadécimal"""
+    import cv2
+    import numpy as np
+    small = cv2.resize(gray, (PHASH_SIZE + 1, PHASH_SIZE), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return np.packbits(bits).tobytes().hex()
+
+
+def page_signature(gray, width: int = SIGNATURE_WIDTH) -> bytes:
+    """Page binarisée (Otsu) à largeur fixe, compressée, pour vérifier un candidat trouvé par empreinte"""
+    import cv2
+    import numpy as np
+    height = max(1, round(gray.shape[0] * width / gray.shape[1]))
+    interpolation = cv2.INTER_AREA if gray.shape[1] > width else cv2.INTER_LINEAR
+    small = cv2.GaussianBlur(cv2.resize(gray, (width, height), interpolation=interpolation), (3, 3), 0)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return height.to_bytes(2, 'big') + width.to_bytes(2, 'big') + zlib.compress(np.packbits(ink).tobytes())
+
+
+def _unpack_signature(signature: bytes):
+    import numpy as np
+    height, width = int.from_bytes(signature[:2], 'big'), int.from_bytes(signature[2:4], 'big')
+    bits = np.unpackbits(np.frombuffer(zlib.decompress(signature[4:]), np.uint8))
+    return bits[:height * width].reshape(height, width)
+
+
+def _align_ink(reference, moving):
+    """Recale `moving` sur `reference` (rotation + translation, ECC sur une vignette) ; None si impossible"""
+    import cv2
+    import numpy as np
+    scale = 256 / reference.shape[1]
+    
+    def thumbnail(ink):
+        small = cv2.resize(ink.astype(np.float32), None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (0, 0), 1)
+    
+    warp = np.eye(2, 3, dtype=np.float32)
+    criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 50, 1e-4)
+    try:
+        _, warp = cv2.findTransformECC(thumbnail(reference), thumbnail(moving), warp,
+                                       cv2.MOTION_EUCLIDEAN, criteria, None, 5)
+    except cv2.error:
+        return None
+    warp[:, 2] /= scale
+    return cv2.warpAffine(moving, warp, (reference.shape[1], reference.shape[0]),
+                          flags=cv2.INTER_NEAREST | cv2.WARP_INVERSE_MAP)
+
+
+def signature_difference(first: bytes, second: bytes) -> int:
+    """Plus grand nombre de pixels d'encre discordants dans une tuile, après recalage (0 = pages identiques)
+    
+    Un contour décalé d'un pixel n'est pas une différence (exposition, bruit, JPEG) ;
+    une valeur de champ modifiée concentre ses pixels discordants dans une tuile.
+    """
+    import cv2
+    import numpy as np
+    try:
+        a, b = _unpack_signature(first), _unpack_signature(second)
+    except (zlib.error, ValueError):
+        return SIGNATURE_MISMATCH  # Signature d'un ancien format
+    if a.shape[1] != b.shape[1] or abs(a.shape[0] - b.shape[0]) > 0.02 * a.shape[0]:
+        return SIGNATURE_MISMATCH
+    height = min(a.shape[0], b.shape[0])
+    a, b = a[:height], b[:height]
+    b = _align_ink(a, b)
+    if b is None:
+        return SIGNATURE_MISMATCH
+    
+    rows, cols = height // SIGNATURE_TILE, a.shape[1] // SIGNATURE_TILE
+    if not rows or not cols:
+        return SIGNATURE_MISMATCH
+    
+    def per_tile(mask):
+        return mask[:rows * SIGNATURE_TILE, :cols * SIGNATURE_TILE].reshape(
+            rows, SIGNATURE_TILE, cols, SIGNATURE_TILE).sum(axis=(1, 3))
+    
+    # Encre d'une page absente (à un pixel près) de l'autre ; petit décalage local toléré par tuile
+    kernel = np.ones((3, 3), np.uint8)
+    a_near = cv2.dilate(a, kernel)
+    best = None
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            shifted = np.roll(b, (dy, dx), axis=(0, 1))
+            mismatch = (a & (1 - cv2.dilate(shifted, kernel))) | (shifted & (1 - a_near))
+            counts = per_tile(mismatch)
+            best = counts if best is None else np.minimum(best, counts)
+    return int(best.max())
+
+
+def make_key(*parts: Any) -> str:
+    """Clé de cache stable à partir d'empreintes et de réglages (sérialisés en JSON trié)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class OCRCache:
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or os.environ.get('OCR_CACHE_PATH', os.path.join('cache', 'ocr_cache.sqlite3'))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('OCR_CACHE_MAX_MB', 512)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key))''')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)')
+            bands = ', '.join(f'band{i} TEXT NOT NULL' for i in range(PHASH_BANDS))
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS phash (
+                settings_key TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                {bands},
+                signature BLOB NOT NULL,
+                page_key TEXT NOT NULL PRIMARY KEY)''')
+            for i in range(PHASH_BANDS):
+                conn.execute(f'CREATE INDEX IF NOT EXISTS phash_band{i} ON phash (settings_key, band{i})')
+            conn.execute('''CREATE TABLE IF NOT EXISTS stats (
+                namespace TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0)''')
+
+    def _connect(self) -> sqlite3.Connection:
+        # Une connexion par appel : sûr après fork (gunicorn, pool de pages)
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _count(self, conn: sqlite3.Connection, namespace: str, field: str):
+        conn.execute('INSERT OR IGNORE INTO stats (namespace) VALUES (?)', (namespace,))
+        conn.execute(f'UPDATE stats SET {field} = {field} + 1 WHERE namespace = ?', (namespace,))
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Retourne la valeur en cache (et la marque comme récemment utilisée) ou None"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute('SELECT value FROM entries WHERE namespace = ? AND key = ?',
+                                   (namespace, key)).fetchone()
+                if row is None:
+                    self._count(conn, namespace, 'misses')
+                    return None
+                conn.execute('UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?',
+                             (time.time(), namespace, key))
+                self._count(conn, namespace, 'hits')
+            return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        except Exception as e:
+            print(f"⚠️ Lecture cache OCR impossible: {e}")
+            return None
+
+    def set(self, namespace: str, key: str, value: Any):
+        """Enregistre une valeur puis évince les entrées les moins récemment utilisées si besoin"""
+        try:
+            blob = zlib.compress(json.dumps(value, default=str).encode('utf-8'))
+            if len(blob) > self.max_bytes:
+                return
+            with closing(self._connect()) as conn, conn:
+                conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                             (namespace, key, blob, len(blob), time.time()))
+                self._evict(conn)
+        except Exception as e:
+            print(f"⚠️ Écriture cache OCR impossible: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        to_delete = []
+        for namespace, key, size in conn.execute(
+                'SELECT namespace, key, size FROM entries ORDER BY last_access'):
+            to_delete.append((namespace, key))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany('DELETE FROM entries WHERE namespace = ? AND key = ?', to_delete)
+        conn.executemany('DELETE FROM phash WHERE page_key = ?',
+                         [(key,) for namespace, key in to_delete if namespace == 'page'])
+        print(f"🧹 Cache OCR: {len(to_delete)} entrée(s) évincée(s)")
+
+    def add_near_duplicate(self, settings_key: str, phash: str, signature: bytes, page_key: str):
+        """Indexe une page (empreinte + vignette) sous la clé de son résultat OCR dans l'espace 'page'"""
+        step = len(phash) // PHASH_BANDS
+        bands = [phash[i * step:(i + 1) * step] for i in range(PHASH_BANDS)]
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(f'INSERT OR REPLACE INTO phash VALUES (?, ?, {", ".join("?" * PHASH_BANDS)}, ?, ?)',
+                             (settings_key, phash, *bands, signature, page_key))
+        except Exception as e:
+            print(f"⚠️ Écriture index perceptuel impossible: {e}")
+    
+    def find_near_duplicate(self, settings_key: str, phash: str, signature: bytes,
+                            max_distance: int, max_pixels: int) -> Optional[Tuple[str, int]]:
+        """Page indexée la plus proche : (clé du résultat, distance de Hamming) ou None
+        
+        Candidats : au moins une bande d'empreinte identique, puis distance de Hamming
+        sur l'empreinte complète ; les plus proches sont vérifiés tuile par tuile
+        (au plus max_pixels pixels discordants dans chaque tuile).
+        """
+        step = len(phash) // PHASH_BANDS
+        bands = [phash[i * step:(i + 1) * step] for i in range(PHASH_BANDS)]
+        where = ' OR '.join(f'band{i} = ?' for i in range(PHASH_BANDS))
+        target = int(phash, 16)
+        try:
+            with closing(self._connect()) as conn, conn:
+                candidates = conn.execute(
+                    f'SELECT hash, signature, page_key FROM phash WHERE settings_key = ? AND ({where})',
+                    (settings_key, *bands)).fetchall()
+                ranked = sorted(
+                    (bin(target ^ int(candidate_hash, 16)).count('1'), page_key, candidate_signature)
+                    for candidate_hash, candidate_signature, page_key in candidates
+                )
+                best = None
+                for distance, page_key, candidate_signature in ranked[:MAX_VERIFIED_CANDIDATES]:
+                    if distance > max_distance:
+                        break
+                    if signature_difference(signature, candidate_signature) <= max_pixels:
+                        best = (page_key, distance)
+                        break
+                self._count(conn, 'near_duplicate', 'hits' if best else 'misses')
+            return best
+        except Exception as e:
+            print(f"⚠️ Lecture index perceptuel impossible: {e}")
+            return None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs hits/misses par espace de noms et occupation du cache"""
+        with closing(self._connect()) as conn:
+            counters = {
+                namespace: {'hits': hits, 'misses': misses}
+                for namespace, hits, misses in conn.execute('SELECT namespace, hits, misses FROM stats')
+            }
+            entries, size = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            indexed_pages = conn.execute('SELECT COUNT(*) FROM phash').fetchone()[0]
+        return {
+            'entries': entries,
+            'indexed_pages': indexed_pages,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'namespaces': counters
+        }
@@ -0,0 +1,254 @@
+"""Moteurs OCR Tesseract réutilisables.
+
+Deux implémentations partagent la même interface :
+- TesserocrEngine : garde des handles libtesseract initialisés en mémoire,
+  un par thread et par langue (modèle chargé une fois), réutilisés d'un appel
+  et d'une requête à l'autre ; segmentation et variables fixées à chaque appel
+- SubprocessEngine : un processus `tesseract` par appel, conservé comme repli
+
+Les deux reçoivent les pixels bruts (niveaux de gris ou RGB) : aucune image
+n'est réencodée en PNG ni écrite dans un fichier temporaire.
+"""
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # libtesseract / tesserocr non installés
+    tesserocr = None
+
+
+def _as_pixels(image) -> np.ndarray:
+    """Tableau contigu de pixels bruts : gris (2D) ou RGB (tableaux OpenCV supposés BGR)"""
+    if isinstance(image, Image.Image):
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        return np.ascontiguousarray(np.asarray(image))
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return np.ascontiguousarray(image, dtype=np.uint8)
+
+
+def _to_pnm(image) -> bytes:
+    """En-tête PGM/PPM + pixels bruts, lisible par tesseract sur stdin (aucune compression)"""
+    pixels = _as_pixels(image)
+    height, width = pixels.shape[:2]
+    magic = b'P5' if pixels.ndim == 2 else b'P6'
+    return b'%s\n%d %d\n255\n' % (magic, width, height) + pixels.tobytes()
+
+
+def _words_to_text(words: List[Dict[str, Any]]) -> str:
+    """Reconstitue le texte (lignes et blocs) à partir des mots reconnus"""
+    lines = []
+    current_key = None
+    current_block = None
+    for word in words:
+        key = (word['block'], word['par'], word['line'])
+        if key != current_key:
+            if current_block is not None and word['block'] != current_block:
+                lines.append('')
+            lines.append(word['text'])
+            current_key = key
+            current_block = word['block']
+        else:
+            lines[-1] += ' ' + word['text']
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+class SubprocessEngine:
+    """Repli : un processus tesseract par appel, image transmise sur stdin"""
+    name = 'subprocess'
+
+    def _run(self, image, lang: str, psm: int, variables: Optional[Dict[str, Any]],
+             extra: Optional[List[str]] = None, tessdata: Optional[str] = None) -> str:
+        cmd = [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '-l', lang, '--psm', str(psm)]
+        if tessdata:
+            cmd += ['--tessdata-dir', tessdata]
+        for key, value in (variables or {}).items():
+            cmd += ['-c', f'{key}={value}']
+        cmd += extra or []
+        result = subprocess.run(cmd, input=_to_pnm(image), capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', errors='replace').strip())
+        return result.stdout.decode('utf-8', errors='replace')
+
+    def image_to_string(self, image, lang: str = 'fra+eng', psm: int = 6,
+                        variables: Optional[Dict[str, Any]] = None, tessdata: Optional[str] = None) -> str:
+        return self._run(image, lang, psm, variables, tessdata=tessdata)
+
+    def recognize(self, image, lang: str = 'fra+eng', psm: int = 6,
+                  variables: Optional[Dict[str, Any]] = None, tessdata: Optional[str] = None) -> Dict[str, Any]:
+        """Une seule passe OCR : texte + mots avec boîtes et confiances (sortie TSV)"""
+        lines = self._run(image, lang, psm, variables, extra=['tsv'], tessdata=tessdata).splitlines()
+        words = []
+        for line in lines[1:]:  # Première ligne : en-tête TSV
+            fields = line.split('\t')
+            if len(fields) < 12 or not fields[11].strip():
+                continue
+            words.append({
+                'text': fields[11].strip(),
+                'conf': float(fields[10]),
+                'left': int(fields[6]),
+                'top': int(fields[7]),
+                'width': int(fields[8]),
+                'height': int(fields[9]),
+                'block': int(fields[2]),
+                'par': int(fields[3]),
+                'line': int(fields[4]),
+            })
+        return {'text': _words_to_text(words), 'words': words}
+
+    def detect_orientation(self, image) -> Dict[str, Any]:
+        """Détection d'orientation (OSD) : rotation horaire à appliquer et confiance"""
+        output = self._run(image, 'osd', 0, None)
+        values = dict(
+            (key.strip(), value.strip())
+            for key, value in (line.split(':', 1) for line in output.splitlines() if ':' in line)
+        )
+        return {'rotate': int(values['Rotate']) % 360, 'confidence': float(values['Orientation confidence'])}
+
+
+class TesserocrEngine:
+    """Handles libtesseract persistants, un par thread et par langue"""
+    name = 'tesserocr'
+
+    def __init__(self, tessdata_path: Optional[str] = None):
+        self.tessdata_path = tessdata_path or os.environ.get('TESSDATA_PREFIX')
+        self._local = threading.local()
+        self._fallback = SubprocessEngine()
+
+    def _set_image(self, api, image):
+        """Passe les pixels bruts à libtesseract (SetImageBytes, sans PNG ni fichier)"""
+        pixels = _as_pixels(image)
+        height, width = pixels.shape[:2]
+        channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+        api.SetImageBytes(pixels.tobytes(), width, height, channels, width * channels)
+
+    def _get_api(self, lang: str, tessdata: Optional[str] = None):
+        """Retourne le handle du thread courant pour cette langue et ces modèles (créé au besoin)"""
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+
+        tessdata = tessdata or self.tessdata_path
+        key = (lang, tessdata)
+        if key not in apis:
+            kwargs = {'lang': lang}
+            if tessdata:
+                kwargs['path'] = tessdata
+            try:
+                api = tesserocr.PyTessBaseAPI(**kwargs)
+                print(f"✅ Handle Tesseract initialisé ({lang}) - thread {threading.get_ident()}")
+            except Exception as e:
+                print(f"⚠️ Initialisation libtesseract échouée ({lang}): {e} - repli subprocess")
+                api = None
+            apis[key] = api
+        return apis[key]
+
+    @contextmanager
+    def _configured(self, api, psm: int, variables: Optional[Dict[str, Any]]):
+        """Segmentation et variables de cet appel ; valeurs précédentes rétablies et image libérée ensuite"""
+        api.SetPageSegMode(psm)
+        previous = {}
+        for name, value in (variables or {}).items():
+            previous[name] = api.GetVariableAsString(name)
+            api.SetVariable(name, str(value))
+        try:
+            yield api
+        finally:
+            for name, value in previous.items():
+                api.SetVariable(name, value if value is not None else '')
+            api.Clear()
+
+    def image_to_string(self, image, lang: str = 'fra+eng', psm: int = 6,
+                        variables: Optional[Dict[str, Any]] = None, tessdata: Optional[str] = None) -> str:
+        api = self._get_api(lang, tessdata)
+        if api is None:
+            return self._fallback.image_to_string(image, lang=lang, psm=psm, variables=variables,
+                                                  tessdata=tessdata)
+
+        with self._configured(api, psm, variables):
+            self._set_image(api, image)
+            return api.GetUTF8Text()
+
+    def recognize(self, image, lang: str = 'fra+eng', psm: int = 6,
+                  variables: Optional[Dict[str, Any]] = None, tessdata: Optional[str] = None) -> Dict[str, Any]:
+        """Une seule passe OCR : texte + mots avec boîtes et confiances"""
+        api = self._get_api(lang, tessdata)
+        if api is None:
+            return self._fallback.recognize(image, lang=lang, psm=psm, variables=variables, tessdata=tessdata)
+
+        with self._configured(api, psm, variables):
+            self._set_image(api, image)
+            api.Recognize()
+            text = api.GetUTF8Text()
+            words = []
+            block = par = line = 0
+            iterator = api.GetIterator()
+            if iterator is not None:
+                for word in tesserocr.iterate_level(iterator, tesserocr.RIL.WORD):
+                    word_text = word.GetUTF8Text(tesserocr.RIL.WORD)
+                    if not word_text or not word_text.strip():
+                        continue
+                    if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                        block += 1
+                    if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                        par += 1
+                    if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                        line += 1
+                    x1, y1, x2, y2 = word.BoundingBox(tesserocr.RIL.WORD)
+                    words.append({
+                        'text': word_text.strip(),
+                        'conf': float(word.Confidence(tesserocr.RIL.WORD)),
+                        'left': x1,
+                        'top': y1,
+                        'width': x2 - x1,
+                        'height': y2 - y1,
+                        'block': block,
+                        'par': par,
+                        'line': line,
+                    })
+            return {'text': text, 'words': words}
+
+    def detect_orientation(self, image) -> Dict[str, Any]:
+        """Détection d'orientation (OSD) : rotation horaire à appliquer et confiance"""
+        api = self._get_api('osd')
+        if api is None:
+            return self._fallback.detect_orientation(image)
+
+        with self._configured(api, tesserocr.PSM.OSD_ONLY, None):
+            self._set_image(api, image)
+            osd = api.DetectOrientationScript()
+        if not osd:
+            raise RuntimeError("OSD: pas assez de texte pour déterminer l'orientation")
+        return {'rotate': (360 - int(osd['orient_deg'])) % 360, 'confidence': float(osd['orient_conf'])}
+
+    def close(self):
+        """Libère les handles du thread courant"""
+        for api in getattr(self._local, 'apis', {}).values():
+            if api is not None:
+                api.End()
+        self._local.apis = {}
+
+
+def create_engine(kind: Optional[str] = None):
+    """Crée le moteur OCR selon OCR_ENGINE (auto | tesserocr | subprocess)"""
+    kind = (kind or os.environ.get('OCR_ENGINE', 'auto')).lower()
+
+    if kind in ('auto', 'tesserocr'):
+        if tesserocr is not None:
+            print("✅ Moteur OCR: libtesseract en mémoire (tesserocr)")
+            return TesserocrEngine()
+        if kind == 'tesserocr':
+            print("⚠️ tesserocr non installé - repli sur le moteur subprocess")
+
+    print("✅ Moteur OCR: subprocess (pytesseract)")
+    return SubprocessEngine()
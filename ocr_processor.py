@@ -3,15 +3,257 @@ from PIL import Image
 import cv2
 import numpy as np
 import pdf2image
+import pypdf
 import re
 import subprocess
 import os
-from typing import Dict, List, Any
+import io
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+from ocr_scheduler import OCRScheduler  # Avant le moteur : fixe OMP_THREAD_LIMIT
+from ocr_engine import create_engine
+from ocr_cache import OCRCache, hash_bytes, hash_file, hash_image, make_key, perceptual_hash, page_signature
+from table_engine import detect_ruled_tables, grid_cells, ink_mask
+from form_templates import FormTemplateStore, field_crop, map_box
+
+# Réglages OCR par défaut (surchargeables à la construction ou par requête)
+DEFAULT_OCR_SETTINGS = {
+    'lang': 'fra+eng',
+    # Détection de langue sur un échantillon de la première page OCRisée : modèle unique si possible
+    'detect_language': os.environ.get('OCR_DETECT_LANG', '1') != '0',
+    'language_sample_lines': 8,  # Hauteur de l'échantillon, en lignes de texte
+    'language_min_words': 10,
+    # single_pass : une passe + repli si confiance/couverture insuffisante
+    # multi_pass : ancien comportement (psm 6/11/3, le texte le plus long gagne)
+    'ocr_mode': os.environ.get('OCR_MODE', 'single_pass'),
+    'psm': 6,
+    'fallback_psm': [11, 3],
+    'min_confidence': float(os.environ.get('OCR_MIN_CONFIDENCE', 60)),
+    'min_coverage': float(os.environ.get('OCR_MIN_COVERAGE', 0.6)),
+    # Nombre max de pages OCRisées en parallèle par requête (0 = tous les cœurs)
+    'max_parallel_pages': int(os.environ.get('OCR_MAX_PARALLEL_PAGES', 0)),
+    # Rastérisation PDF : résolution et nombre de pages rendues à la fois
+    'dpi': 300,
+    'raster_window': int(os.environ.get('OCR_RASTER_WINDOW', 1)),
+    # DPI adaptative : sonde basse résolution pour amener les glyphes à la taille préférée de Tesseract
+    'adaptive_dpi': os.environ.get('OCR_ADAPTIVE_DPI', '1') != '0',
+    'probe_dpi': 100,
+    'min_dpi': 150,
+    'max_dpi': 400,
+    'target_char_height': 21,  # Hauteur d'x visée en pixels (corps 10 à 300 dpi)
+    # Photos JPEG : décodage direct à 1/2, 1/4 ou 1/8 (DCT réduite) d'après une sonde à 1/8
+    'jpeg_reduced_decode': os.environ.get('OCR_JPEG_REDUCED', '1') != '0',
+    'max_image_side': int(os.environ.get('OCR_MAX_IMAGE_SIDE', 4200)),  # Si la sonde ne mesure pas le texte
+    # OCR par blocs de texte détectés (marges, logos et photos ignorés), en parallèle
+    'region_ocr': os.environ.get('OCR_REGIONS', '1') != '0',
+    'region_workers': int(os.environ.get('OCR_REGION_WORKERS', 0)),  # 0 = automatique
+    # Redressement (orientation OSD + inclinaison) sur une vignette avant l'OCR
+    'deskew': os.environ.get('OCR_DESKEW', '1') != '0',
+    'max_skew': 10.0,  # Inclinaison maximale recherchée, en degrés
+    'osd_min_confidence': 2.0,
+    # Pages blanches (séparateurs, versos) : détectées par densité d'encre, jamais OCRisées
+    'skip_blank_pages': os.environ.get('OCR_SKIP_BLANK', '1') != '0',
+    'blank_ink_ratio': float(os.environ.get('OCR_BLANK_INK_RATIO', 0.0005)),
+    # Seuillage : otsu (fixe) ou auto (gaussian/mean/otsu/original choisi par statistiques d'image)
+    'binarization': os.environ.get('OCR_BINARIZATION', 'otsu'),
+    # Tableaux à filets : grille détectée sur l'image puis OCR cellule par cellule
+    'table_detection': os.environ.get('OCR_TABLES', '1') != '0',
+    'table_cell_min_ink': 0.005,  # Part d'encre sous laquelle une cellule est considérée vide
+    # Jeu de caractères autorisé (tessedit_char_whitelist), None = tous
+    'char_whitelist': None,
+    # Modèles LSTM : None (tessdata installé), 'fast' ou 'best' (voir TESSDATA_DIRS)
+    'tessdata_model': None,
+    # Couche texte PDF : minimum de caractères pour éviter l'OCR d'une page
+    'text_layer_min_chars': int(os.environ.get('OCR_TEXT_LAYER_MIN_CHARS', 30)),
+    # Cache disque des résultats (clé : contenu du fichier + réglages OCR)
+    'use_cache': os.environ.get('OCR_CACHE', '1') != '0',
+    # Pages à traiter (« 1-5,12 ») pour les PDF et TIFF multipages ; None = toutes
+    'pages': None,
+    # Rescans quasi identiques (empreinte perceptuelle + vérification par tuiles) : OCR de la page réutilisé ;
+    # désactivable par requête (near_duplicates=0) ou globalement (OCR_NEAR_DUPLICATES=0)
+    'near_duplicates': os.environ.get('OCR_NEAR_DUPLICATES', '1') != '0',
+    'near_duplicate_distance': int(os.environ.get('OCR_NEAR_DUPLICATE_DISTANCE', 24)),  # bits sur 256
+    # Pixels discordants tolérés par tuile de 64 px (page ramenée à 2048 px de large)
+    'near_duplicate_max_pixels': int(os.environ.get('OCR_NEAR_DUPLICATE_MAX_PIXELS', 2)),
+    # Formulaires enregistrés comme modèles : recalage sur vignette puis OCR des seules zones de champs
+    'form_templates': os.environ.get('OCR_FORM_TEMPLATES', '1') != '0',
+    'template_min_inliers': int(os.environ.get('OCR_TEMPLATE_MIN_INLIERS', 40)),
+}
+
+# Marqueurs de langue : mots outils fréquents et caractères propres à la langue
+LANGUAGE_MARKERS = {
+    'fra': {
+        'words': {'le', 'la', 'les', 'de', 'des', 'du', 'et', 'en', 'un', 'une', 'pour', 'par', 'sur',
+                  'au', 'aux', 'est', 'dans', 'que', 'qui', 'avec', 'ou', 'ce', 'cette', 'sont', 'pas'},
+        'chars': set('àâçéèêëîïôûùüÿœ'),
+    },
+    'eng': {
+        'words': {'the', 'and', 'of', 'to', 'in', 'for', 'is', 'on', 'with', 'by', 'this', 'that',
+                  'from', 'are', 'be', 'as', 'at', 'or', 'an', 'it', 'was', 'which', 'not', 'have'},
+        'chars': set(),
+    },
+}
+
+# Caractères des montants et libellés budgétaires (exclut |, ~, {, }, <, >... souvent lus à tort)
+_AMOUNT_CHARS = ("0123456789 .,-+%€$()/:'"
+                 "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+                 "àâäçéèêëîïôöùûüÿÀÂÄÇÉÈÊËÎÏÔÖÙÛÜŸœŒ")
+
+# Profils OCR par type de document (ids de /api/data_types) : une seule configuration
+# appliquée quand le type est choisi, sans segmentations de repli
+OCR_PROFILES = {
+    'budget': {
+        'psm': 6, 'fallback_psm': [], 'lang': 'fra',
+        'min_dpi': 200, 'target_char_height': 24,  # Chiffres serrés : glyphes un peu plus grands
+        'binarization': 'otsu', 'table_detection': True, 'region_ocr': True,
+        'char_whitelist': _AMOUNT_CHARS,
+    },
+    'laboratoire': {
+        'psm': 6, 'fallback_psm': [], 'lang': 'fra+eng',
+        'binarization': 'otsu', 'table_detection': True, 'region_ocr': True,
+    },
+    'rh_laboratoire': {
+        'psm': 6, 'fallback_psm': [], 'lang': 'fra',
+        'binarization': 'otsu', 'table_detection': True, 'region_ocr': True,
+    },
+    'voirie': {
+        'psm': 6, 'fallback_psm': [], 'lang': 'fra',
+        'binarization': 'auto', 'table_detection': True, 'region_ocr': True,
+    },
+    'tabular': {
+        'psm': 6, 'fallback_psm': [], 'lang': 'fra+eng',
+        'binarization': 'otsu', 'table_detection': True, 'region_ocr': True,
+    },
+    'formation': {
+        'psm': 3, 'fallback_psm': [], 'lang': 'fra+eng',
+        'binarization': 'auto', 'table_detection': False, 'region_ocr': False,
+    },
+    'legal': {
+        # Texte courant en colonnes : la segmentation automatique (psm 3) suffit
+        'psm': 3, 'fallback_psm': [], 'lang': 'fra',
+        'target_char_height': 18, 'binarization': 'otsu',
+        'table_detection': False, 'region_ocr': False,
+    },
+    'administrative': {
+        'psm': 3, 'fallback_psm': [], 'lang': 'fra',
+        'binarization': 'auto', 'table_detection': True, 'region_ocr': False,
+    },
+}
+
+# Répertoires des modèles tessdata_fast / tessdata_best (absents : modèles installés par défaut)
+TESSDATA_DIRS = {
+    'fast': os.environ.get('OCR_TESSDATA_FAST', '/usr/share/tessdata_fast'),
+    'best': os.environ.get('OCR_TESSDATA_BEST', '/usr/share/tessdata_best'),
+}
+
+# Niveaux vitesse/qualité (champ `mode` de /upload) : appliqués après le profil du type
+QUALITY_MODES = {
+    'fast': {
+        # Aperçu : résolution réduite, une passe, pas de redressement ni de repli
+        'adaptive_dpi': True, 'dpi': 200, 'min_dpi': 120, 'max_dpi': 200, 'target_char_height': 16,
+        'ocr_mode': 'single_pass', 'fallback_psm': [], 'deskew': False,
+        'binarization': 'otsu', 'tessdata_model': 'fast',
+    },
+    'balanced': {},
+    'accurate': {
+        # Fidélité maximale : glyphes plus grands, seuillage choisi par page, replis plus exigeants
+        'adaptive_dpi': True, 'dpi': 400, 'min_dpi': 200, 'max_dpi': 500, 'target_char_height': 24,
+        'ocr_mode': 'single_pass', 'fallback_psm': [11, 3], 'min_confidence': 75,
+        'deskew': True, 'binarization': 'auto', 'tessdata_model': 'best',
+    },
+}
+DEFAULT_QUALITY_MODE = os.environ.get('OCR_QUALITY_MODE', 'balanced')
+
+# Réglages sans effet sur le résultat, exclus des clés de cache
+CACHE_NEUTRAL_SETTINGS = {'max_parallel_pages', 'raster_window', 'region_workers', 'use_cache',
+                          'near_duplicates', 'near_duplicate_distance', 'near_duplicate_max_pixels'}
+# Une page OCRisée reste réutilisable quelle que soit la sélection de pages du document
+PAGE_CACHE_NEUTRAL_SETTINGS = CACHE_NEUTRAL_SETTINGS | {'pages'}
+
+def _lap(timings: Dict[str, float], stage: str, start: float) -> float:
+    """Ajoute la durée écoulée depuis start à l'étape et retourne l'instant courant"""
+    now = time.perf_counter()
+    timings[stage] = round(timings.get(stage, 0.0) + now - start, 4)
+    return now
+
+def parse_page_ranges(spec: Optional[str], page_count: Optional[int] = None) -> Optional[List[int]]:
+    """Pages demandées (« 1-5,12 », « 3- » jusqu'à la fin) ; None = toutes les pages
+    
+    Sans page_count, seule la syntaxe est vérifiée ; avec, les pages au-delà du document sont ignorées.
+    """
+    if spec is None or not str(spec).strip():
+        return None
+    last = page_count if page_count is not None else 0
+    pages = set()
+    for part in str(spec).replace(' ', '').split(','):
+        match = re.fullmatch(r'(\d+)(?:-(\d*))?', part)
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Sélection de pages invalide: '{part}' (exemple: 1-5,12)")
+        first = int(match.group(1))
+        if match.group(2) is None:
+            end = first
+        elif match.group(2) == '':
+            end = max(first, last)  # « 3- » : jusqu'à la dernière page
+        else:
+            end = int(match.group(2))
+        if end < first:
+            raise ValueError(f"Sélection de pages invalide: '{part}' (début après la fin)")
+        if page_count is not None:
+            end = min(end, page_count)
+        pages.update(range(first, end + 1))
+    return sorted(pages)
 
 class OCRProcessor:
-    def __init__(self):
-        self._verify_tesseract_installation()
-        self._configure_tesseract_path()
+    def __init__(self, verify_installation: bool = True, **settings):
+        if verify_installation:
+            self._verify_tesseract_installation()
+            self._configure_tesseract_path()
+        # Part des cœurs de ce worker et plan de parallélisme par document
+        self.scheduler = OCRScheduler()
+        # Moteur OCR persistant (handles libtesseract réutilisés entre requêtes)
+        self.engine = create_engine()
+        self.settings = {**DEFAULT_OCR_SETTINGS, **settings}
+        # Pool de processus pour l'OCR des pages (créé à la première utilisation)
+        self._page_pool = None
+        # Threads persistants pour l'OCR des blocs (les handles Tesseract restent par thread)
+        self._region_pool = None
+        # Cache des résultats partagé par les workers du nœud
+        try:
+            self.cache = OCRCache()
+        except Exception as e:
+            print(f"⚠️ Cache OCR désactivé: {e}")
+            self.cache = None
+        # Modèles de formulaires récurrents (partagés entre workers via le disque)
+        try:
+            self.templates = FormTemplateStore()
+        except Exception as e:
+            print(f"⚠️ Modèles de formulaires désactivés: {e}")
+            self.templates = None
+        
+        # Parsers spécialisés par type de document
+        self.specialized_parsers = {
+            'budget': self._parse_budget_data,
+            'laboratoire': self._parse_lab_data,
+            'rh_laboratoire': self._parse_rh_data,
+            'voirie': self._parse_voirie_data,
+            'formation': self._parse_formation_data,
+            'tabular': self._parse_tabular_data_enhanced,
+            'legal': self._parse_legal_data,
+            'administrative': self._parse_administrative_data,
+        }
+        
+        # Détecteurs automatiques de type
+        self.content_detectors = [
+            self._detect_budget,
+            self._detect_formation,
+            self._detect_tabular,
+            self._detect_legal,
+            self._detect_administrative,
+            self._detect_rh_laboratoire
+        ]
         
     def _verify_tesseract_installation(self):
         """Vérifie et installe Tesseract si nécessaire"""
@@ -180,34 +422,103 @@ class OCRProcessor:
             print(f"❌ Erreur prétraitement: {e}")
             return image
 
-    def process_file(self, filepath: str, data_type: str = 'auto') -> Dict[str, Any]:
-        """Traite le fichier avec détection automatique ou manuelle du type"""
-        # Extraction OCR
-        text = self._extract_text(filepath)
-        print(f"📝 Texte extrait ({len(text)} caractères)")
-        
-        # Détection automatique si demandé
-        if data_type == 'auto':
-            detected_type = self._auto_detect_content_type(text)
-            print(f"🔍 Type détecté: {detected_type}")
-            
-            # Utiliser le parser tabulaire amélioré si détecté
-            if detected_type == 'tabular':
-                parser = self._parse_tabular_data_enhanced
-            else:
-                parser = self.specialized_parsers.get(detected_type, self._parse_universal)
-            data_type = detected_type
+    def process_file(self, filepath: str, data_type: str = 'auto', file_bytes: Optional[bytes] = None,
+                     mode: Optional[str] = None, pages: Optional[str] = None, **options) -> Dict[str, Any]:
+        """Traite le fichier avec détection automatique ou manuelle du type
+        
+        file_bytes : contenu de l'upload déjà en mémoire ; les images sont alors
+        décodées directement depuis ce tampon (filepath ne sert qu'au nom/extension)
+        mode : niveau vitesse/qualité (fast | balanced | accurate, voir QUALITY_MODES)
+        pages : pages à traiter pour les PDF et TIFF multipages (« 1-5,12 ») ; None = toutes
+        """
+        started = time.perf_counter()
+        mode = mode or DEFAULT_QUALITY_MODE
+        if mode not in QUALITY_MODES:
+            raise ValueError(f"Mode inconnu: {mode} (attendu: {', '.join(QUALITY_MODES)})")
+        parse_page_ranges(pages)  # Syntaxe vérifiée avant tout traitement
+        if pages:
+            options['pages'] = pages
+        
+        # Type choisi manuellement : profil OCR du type (une seule configuration),
+        # puis niveau vitesse/qualité, options de requête en dernier
+        profile = OCR_PROFILES.get(data_type, {})
+        settings = {**self.settings, **profile}
+        if profile:
+            settings['ocr_mode'] = 'single_pass'
+        settings.update(QUALITY_MODES[mode])
+        settings.update(options)
+        ocr_report = {'pages': [], 'profile': data_type if profile else 'default', 'mode': mode}
+        
+        # Upload déjà traité avec les mêmes réglages : réponse directe depuis le cache
+        cache_key = None
+        if settings.get('use_cache') and self.cache is not None:
+            content_hash = hash_bytes(file_bytes) if file_bytes is not None else hash_file(filepath)
+            templates_version = self.templates.version if self._use_form_templates(data_type, settings) else None
+            cache_key = make_key(content_hash, data_type, self._cache_settings(settings), templates_version)
+            cached = self.cache.get('document', cache_key)
+            if cached is not None:
+                print("⚡ Résultat servi depuis le cache OCR")
+                cached.setdefault('ocr', {})['cache'] = 'hit'
+                cached['ocr']['timings'] = {'cache_lookup': round(time.perf_counter() - started, 4)}
+                return cached
+            ocr_report['cache'] = 'miss'
+        
+        timings = {}
+        start = _lap(timings, 'cache_lookup', started) if cache_key is not None else started
+        
+        # Formulaire connu : seules les zones de champs passent par l'OCR, champs remplis directement
+        form_result = None
+        loaded = None
+        if self._use_form_templates(data_type, settings) and len(self.templates):
+            # Image décodée une seule fois : réutilisée par l'OCR pleine page si aucun modèle ne correspond
+            loaded = self._load_single_image(filepath, file_bytes, settings)
+            if loaded is not None:
+                form_result = self._process_form_template(*loaded, settings, ocr_report)
+        
+        if form_result is not None:
+            text, parsed_data = form_result
+            data_type = 'form'
+            start = _lap(timings, 'extraction', start)
         else:
-            # Utiliser le parser spécifié
-            if data_type == 'tabular':
-                parser = self._parse_tabular_data_enhanced
+            # Extraction OCR
+            text = self._extract_text(filepath, settings, ocr_report, file_bytes, loaded)
+            start = _lap(timings, 'extraction', start)
+            print(f"📝 Texte extrait ({len(text)} caractères)")
+            
+            # Détection automatique si demandé
+            if data_type == 'auto':
+                detected_type = self._auto_detect_content_type(text)
+                print(f"🔍 Type détecté: {detected_type}")
+                
+                # Utiliser le parser tabulaire amélioré si détecté
+                if detected_type == 'tabular':
+                    parser = self._parse_tabular_data_enhanced
+                else:
+                    parser = self.specialized_parsers.get(detected_type, self._parse_universal)
+                data_type = detected_type
             else:
-                parser = self.specialized_parsers.get(data_type, self._parse_universal)
-        
-        # Parsing
-        parsed_data = parser(text)
+                # Utiliser le parser spécifié
+                if data_type == 'tabular':
+                    parser = self._parse_tabular_data_enhanced
+                else:
+                    parser = self.specialized_parsers.get(data_type, self._parse_universal)
+            
+            # Parsing
+            parsed_data = parser(text)
+            self._merge_grid_tables(parsed_data, ocr_report)
+        _lap(timings, 'parsing', start)
+        
+        # Durées par étape : document, puis cumul des étapes de chaque page
+        timings['total'] = round(time.perf_counter() - started, 4)
+        page_stages = {}
+        for page in ocr_report['pages']:
+            for stage, seconds in page.get('timings', {}).items():
+                page_stages[stage] = round(page_stages.get(stage, 0.0) + seconds, 4)
+        timings['pages'] = page_stages
+        ocr_report['timings'] = timings
         parsed_data['detected_type'] = data_type
         parsed_data['raw_text_preview'] = text[:500] + '...' if len(text) > 500 else text
+        parsed_data['ocr'] = ocr_report
         
         # Log des résultats
         if 'tables' in parsed_data:
@@ -215,8 +526,134 @@ class OCRProcessor:
             for i, table in enumerate(parsed_data['tables']):
                 print(f"  - Tableau {i+1}: {table.get('row_count', 0)} lignes x {table.get('column_count', 0)} colonnes")
         
+        # Extraction en échec (moteur, pool, modèle manquant) : jamais mise en cache
+        failed = ocr_report.get('error') or any(page.get('error') for page in ocr_report['pages'])
+        # OCR emprunté à un autre scan : servi pour cette requête seulement (near_duplicates=0 doit rester effectif)
+        reused = any(page.get('cache') == 'near_duplicate' for page in ocr_report['pages'])
+        if cache_key is not None and not failed and not reused:
+            self.cache.set('document', cache_key, parsed_data)
+        elif cache_key is not None and failed:
+            print("⚠️ Extraction en erreur : résultat non mis en cache")
+        
         return parsed_data
     
+    def _use_form_templates(self, data_type: str, settings: Dict[str, Any]) -> bool:
+        return bool(settings.get('form_templates')) and self.templates is not None \
+            and data_type in ('auto', 'administrative', 'form')
+    
+    def _load_single_image(self, filepath: str, file_bytes: Optional[bytes],
+                           settings: Dict[str, Any]) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """Image d'une seule page décodée en niveaux de gris avec ses informations de page ; None pour PDF et TIFF multipages"""
+        if filepath.lower().endswith('.pdf'):
+            return None
+        image_input = file_bytes if file_bytes is not None else filepath
+        if filepath.lower().endswith(('.tif', '.tiff')) and self._count_tiff_frames(image_input) > 1:
+            return None
+        
+        page_info = {'page': 1, 'source': 'ocr'}
+        start = time.perf_counter()
+        gray = self._load_gray(image_input, settings, page_info)
+        _lap(page_info.setdefault('timings', {}), 'load', start)
+        if gray is None:
+            return None
+        return gray, page_info
+    
+    def _process_form_template(self, gray, page_info: Dict[str, Any], settings: Dict[str, Any],
+                               ocr_report: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Image d'un formulaire enregistré : recalage sur le modèle puis OCR des zones de champs ; sinon None"""
+        timings = page_info['timings']
+        start = time.perf_counter()
+        match = self.templates.match(gray, settings['template_min_inliers'])
+        start = _lap(timings, 'template_match', start)
+        if match is None:
+            return None
+        
+        page_info['source'] = 'template'
+        template = match['template']
+        print(f"🧾 Formulaire reconnu: {template['name']} ({match['inliers']} ancres concordantes)")
+        crops = []
+        for field in template['fields']:
+            crop, to_page = field_crop(gray, field, match['homography'])
+            if crop.std() < 8:
+                crop = None  # Champ non rempli : pas d'OCR
+            else:
+                _, crop = cv2.threshold(cv2.medianBlur(crop, 3), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            crops.append((field, to_page, crop))
+        
+        try:
+            field_results, workers = self._run_in_batches(self._ocr_field_batch, crops, settings)
+        except Exception as e:
+            # Échec du moteur sur les champs : OCR pleine page, qui signale l'erreur de page si elle persiste
+            print(f"⚠️ OCR des champs impossible ({template['name']}): {e} - OCR pleine page")
+            page_info['source'] = 'ocr'
+            page_info['template_error'] = str(e)
+            return None
+
+        # Champs remplis directement ; mots ramenés dans le repère de la page (exports hOCR/ALTO/PDF)
+        fields = {}
+        words = []
+        for block, ((field, to_page, _), result) in enumerate(zip(crops, field_results), start=1):
+            fields[field['name']] = ' '.join(result['text'].split())
+            for word in result['words']:
+                x0, y0, x1, y1 = map_box((word['left'], word['top'], word['left'] + word['width'],
+                                          word['top'] + word['height']), to_page)
+                words.append({**word, 'left': x0, 'top': y0, 'width': x1 - x0, 'height': y1 - y0,
+                              'block': block})
+        _lap(timings, 'ocr', start)
+        
+        page_info.update({
+            'template': template['name'],
+            'template_inliers': match['inliers'],
+            'fields': len(fields),
+            'region_workers': workers,
+            'height': gray.shape[0],
+            'width': gray.shape[1],
+            'words': words,
+        })
+        ocr_report['pages'].append(page_info)
+        ocr_report['template'] = template['name']
+        
+        parsed_data = {
+            'type': 'form',
+            'template': template['name'],
+            'template_type': template['data_type'],
+            'fields': fields,
+        }
+        text = '\n'.join(f"{name}: {value}" for name, value in fields.items())
+        return text, parsed_data
+    
+    def _ocr_field_batch(self, crops: List[Tuple[Dict[str, Any], Any, Any]],
+                         settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = []
+        for field, _, crop in crops:
+            if crop is None:
+                results.append({'text': '', 'words': []})
+                continue
+            field_settings = {**settings, 'char_whitelist': field.get('whitelist') or settings.get('char_whitelist')}
+            results.append(self.engine.recognize(crop, lang=settings['lang'], psm=field.get('psm', 7),
+                                                 **self._engine_options(field_settings)))
+        return results
+    
+    def _merge_grid_tables(self, parsed_data: Dict[str, Any], ocr_report: Dict[str, Any]):
+        """Remplace les tableaux reconstitués depuis le texte par les grilles détectées sur l'image"""
+        grid_tables = [{**table, 'page': page.get('page')}
+                       for page in ocr_report.get('pages', []) for table in page.get('tables', [])]
+        if not grid_tables:
+            return
+        
+        key = 'tableaux' if 'tableaux' in parsed_data else 'tables'
+        grid_rows = {tuple(row) for table in grid_tables for row in [table['headers']] + table['rows']}
+        text_tables = [
+            table for table in parsed_data.get(key, [])
+            if isinstance(table, dict)
+            and not any(tuple(row) in grid_rows for row in table.get('rows', []))
+        ]
+        parsed_data[key] = grid_tables + text_tables
+    
+    def _cache_settings(self, settings: Dict[str, Any], neutral: set = CACHE_NEUTRAL_SETTINGS) -> Dict[str, Any]:
+        """Réglages qui influencent le résultat OCR (partie de la clé de cache)"""
+        return {k: v for k, v in settings.items() if k not in neutral}
+    
     def _auto_detect_content_type(self, text: str) -> str:
         """Détecte automatiquement le type de contenu"""
         scores = {}
@@ -797,81 +1234,872 @@ class OCRProcessor:
         return data
 
     # MÉTHODES D'EXTRACTION ET PRÉTRAITEMENT
-    def _extract_text(self, filepath: str) -> str:
-        """Extrait le texte d'un fichier (PDF ou image) avec améliorations PDF"""
+    def _extract_text(self, filepath: str, settings: Optional[Dict[str, Any]] = None,
+                      report: Optional[Dict[str, Any]] = None, file_bytes: Optional[bytes] = None,
+                      loaded: Optional[Tuple[Any, Dict[str, Any]]] = None) -> str:
+        """Extrait le texte d'un fichier (PDF ou image) avec améliorations PDF
+        
+        loaded : image déjà décodée et ses informations de page (voir _load_single_image)
+        """
+        settings = settings or self.settings
+        if report is None:
+            report = {'pages': []}
+        
         if filepath.lower().endswith('.pdf'):
             try:
                 print("📄 Traitement d'un fichier PDF...")
                 
-                # Essayer d'abord l'extraction texte directe
-                try:
-                    import PyPDF2
-                    with open(filepath, 'rb') as file:
-                        pdf_reader = PyPDF2.PdfReader(file)
-                        text = ""
-                        for page in pdf_reader.pages:
-                            text += page.extract_text() + "\n"
-                        
-                        # Si l'extraction directe donne du texte valide, l'utiliser
-                        if len(text.strip()) > 50:
-                            print("✅ Texte extrait directement du PDF")
-                            return text
-                except Exception as e:
-                    print(f"⚠️ Extraction PDF directe échouée: {e}")
+                # Couche texte native page par page : seules les pages scannées passent par l'OCR
+                results, ocr_page_numbers = self._extract_pdf_text_layer(filepath, settings, report)
                 
-                # Fallback: conversion image + OCR
-                print("🔄 Conversion PDF en images pour OCR...")
-                images = pdf2image.convert_from_path(filepath, dpi=300)  # Augmenter la résolution
-                text = ""
-                for i, image in enumerate(images):
-                    print(f"📄 Traitement page {i+1}/{len(images)}")
-                    page_text = self._extract_text_from_image(image)
-                    text += f"--- Page {i+1} ---\n{page_text}\n\n"
+                if ocr_page_numbers:
+                    print(f"🔄 Conversion en images pour OCR des pages {ocr_page_numbers}...")
+                    pages = self._iter_pdf_pages(filepath, settings, ocr_page_numbers)
+                    results.update(self._ocr_pages(pages, settings, report, len(ocr_page_numbers)))
                 
-                return text
+                return self._assemble_pages(results, report)
                 
             except Exception as e:
                 print(f"❌ Erreur conversion PDF: {e}")
+                report['error'] = str(e)
                 return ""
+        image_input = file_bytes if file_bytes is not None else filepath
+        
+        if filepath.lower().endswith(('.tif', '.tiff')):
+            frame_count = self._count_tiff_frames(image_input)
+            if frame_count > 1:
+                # TIFF multipage (fax, scanners) : même pipeline par page que les PDF
+                print(f"📠 TIFF multipage: {frame_count} pages")
+                report['page_count'] = frame_count
+                selected = parse_page_ranges(settings.get('pages'), frame_count)
+                if selected is not None:
+                    report['selected_pages'] = selected
+                pages = self._iter_tiff_frames(image_input, selected)
+                page_count = len(selected) if selected is not None else frame_count
+                return self._assemble_pages(self._ocr_pages(pages, settings, report, page_count), report)
+        
+        if loaded is not None:
+            gray, page_info = loaded
         else:
-            return self._extract_text_from_image(filepath)
+            page_info = {'page': 1, 'source': 'ocr'}
+            start = time.perf_counter()
+            gray = self._load_gray(image_input, settings, page_info)
+            _lap(page_info.setdefault('timings', {}), 'load', start)
+        if gray is None:
+            text = self._extract_text_from_image(image_input, settings, page_info)
+            report['pages'].append(page_info)
+            return text
+        
+        # Même image, ou rescan quasi identique, déjà OCRisée : résultat de la page en cache
+        cached, cache_key = self._lookup_page_cache(gray, 1, {}, settings)
+        if cached is not None:
+            report['pages'].append(cached[1])
+            return cached[0]
+        
+        # Une seule page : les cœurs du worker vont aux blocs de la page
+        plan = report['scheduler'] = self.scheduler.plan(1, settings)
+        ocr_settings = self._resolve_document_language(gray, {**settings, 'region_workers': plan['region_workers']},
+                                                       report)
+        text = self._extract_text_from_image(gray, ocr_settings, page_info)
+        report['pages'].append(page_info)
+        self._store_page_cache(cache_key, (text, page_info))
+        return text
     
-    def _extract_text_from_image(self, image_path) -> str:
-        """Extraction OCR avec prétraitement et configuration améliorés"""
+    def _open_image(self, image_input) -> Image.Image:
+        if isinstance(image_input, (bytes, bytearray, memoryview)):
+            return Image.open(io.BytesIO(image_input))
+        return Image.open(image_input)
+    
+    def _count_tiff_frames(self, image_input) -> int:
         try:
-            # Charger l'image
-            if isinstance(image_path, str):
-                image = cv2.imread(image_path)
+            with self._open_image(image_input) as tiff:
+                return getattr(tiff, 'n_frames', 1)
+        except Exception as e:
+            print(f"⚠️ Lecture TIFF impossible: {e}")
+            return 1
+    
+    def _iter_tiff_frames(self, image_input,
+                          page_numbers: Optional[List[int]] = None) -> Iterator[Tuple[int, Any, Dict[str, Any]]]:
+        """Décode les pages d'un TIFF une par une (seek) : une seule page en mémoire à la fois"""
+        with self._open_image(image_input) as tiff:
+            indexes = range(getattr(tiff, 'n_frames', 1))
+            if page_numbers is not None:
+                indexes = [number - 1 for number in page_numbers]
+            for index in indexes:
+                tiff.seek(index)
+                frame = np.asarray(tiff.convert('L'))
+                yield index + 1, frame, {'frame': index}
+    
+    def _extract_pdf_text_layer(self, filepath: str, settings: Dict[str, Any],
+                                report: Dict[str, Any]) -> Tuple[Dict[int, Tuple[str, Dict[str, Any]]], List[int]]:
+        """Lit la couche texte (pypdf) de chaque page ; retourne les pages résolues et celles à OCRiser"""
+        results = {}
+        ocr_page_numbers = []
+        
+        try:
+            reader = pypdf.PdfReader(filepath)
+            page_count = len(reader.pages)
+        except Exception as e:
+            print(f"⚠️ Lecture de la couche texte PDF impossible: {e}")
+            reader = None
+            page_count = pdf2image.pdfinfo_from_path(filepath)['Pages']
+        report['page_count'] = page_count
+        
+        # Sélection de pages : couche texte, rastérisation et OCR limités aux pages demandées
+        selected = parse_page_ranges(settings.get('pages'), page_count)
+        if selected is not None:
+            report['selected_pages'] = selected
+            print(f"📑 Pages sélectionnées: {len(selected)}/{page_count}")
+        
+        for number in (selected if selected is not None else range(1, page_count + 1)):
+            page_text = ''
+            if reader is not None:
+                try:
+                    page_text = reader.pages[number - 1].extract_text() or ''
+                except Exception as e:
+                    print(f"⚠️ Couche texte illisible page {number}: {e}")
+            
+            if self._is_usable_text_layer(page_text, settings):
+                results[number] = (page_text, {'page': number, 'source': 'text_layer',
+                                               'text_length': len(page_text)})
+            else:
+                ocr_page_numbers.append(number)
+        
+        report['text_layer_pages'] = sorted(results)
+        report['ocr_pages'] = ocr_page_numbers
+        print(f"✅ Couche texte utilisée pour {len(results)}/{len(results) + len(ocr_page_numbers)} pages")
+        return results, ocr_page_numbers
+    
+    def _is_usable_text_layer(self, text: str, settings: Dict[str, Any]) -> bool:
+        """Une couche texte est exploitable si elle est assez longue et pas du charabia d'encodage"""
+        content = ''.join(text.split())
+        if len(content) < settings['text_layer_min_chars']:
+            return False
+        readable = sum(1 for c in content if c.isalnum() or c in '.,;:!?()[]-/%€$\'"')
+        return readable / len(content) >= 0.7 and '\ufffd' not in content
+    
+    def _iter_pdf_pages(self, filepath: str, settings: Dict[str, Any],
+                        page_numbers: List[int]) -> Iterator[Tuple[int, Any, Dict[str, Any]]]:
+        """Rastérise les pages demandées par petites fenêtres : mémoire constante quel que soit le nombre de pages"""
+        if settings.get('adaptive_dpi'):
+            # Une page à la fois, chacune à sa propre résolution
+            for number in page_numbers:
+                start = time.perf_counter()
+                dpi, char_height, probe = self._choose_page_dpi(filepath, number, settings)
+                timings = {}
+                if probe is not None and settings.get('skip_blank_pages') and self._is_blank_page(probe, settings)[0]:
+                    # Page blanche dès la sonde : pas de rendu pleine résolution (écartée par _resolve_page_without_ocr)
+                    _lap(timings, 'render', start)
+                    yield number, probe, {'dpi': settings['probe_dpi'], 'timings': timings}
+                    continue
+                del probe
+                images = pdf2image.convert_from_path(filepath, dpi=dpi, first_page=number, last_page=number,
+                                                     grayscale=True)
+                page = np.array(images[0])
+                del images
+                _lap(timings, 'render', start)
+                yield number, page, {'dpi': dpi, 'probe_char_height': char_height, 'timings': timings}
+            return
+        
+        window = max(1, int(settings.get('raster_window') or 1))
+        
+        # Fenêtres de pages consécutives (first_page/last_page de pdftoppm)
+        runs = []
+        for number in page_numbers:
+            if runs and number == runs[-1][1] + 1 and runs[-1][1] - runs[-1][0] + 1 < window:
+                runs[-1][1] = number
             else:
-                image = cv2.cvtColor(np.array(image_path), cv2.COLOR_RGB2BGR)
+                runs.append([number, number])
+        
+        for first_page, last_page in runs:
+            start = time.perf_counter()
+            images = pdf2image.convert_from_path(
+                filepath, dpi=settings['dpi'], first_page=first_page, last_page=last_page, grayscale=True
+            )
+            # Durée de rendu de la fenêtre répartie entre ses pages
+            render_seconds = round((time.perf_counter() - start) / max(1, len(images)), 4)
+            for offset in range(len(images)):
+                # Libérer l'image PIL dès sa conversion pour ne pas cumuler les pages
+                page = np.array(images[offset])
+                images[offset] = None
+                yield first_page + offset, page, {'dpi': settings['dpi'], 'timings': {'render': render_seconds}}
+    
+    def _choose_page_dpi(self, filepath: str, number: int,
+                         settings: Dict[str, Any]) -> Tuple[int, Optional[float], Optional[Any]]:
+        """Choisit la DPI de rendu d'une page d'après la hauteur d'x mesurée sur une sonde basse résolution
+        
+        Retourne aussi la sonde (None si le rendu a échoué) : le test de page blanche s'y fait
+        sans rendu pleine résolution.
+        """
+        probe_dpi = settings['probe_dpi']
+        try:
+            probe = np.array(pdf2image.convert_from_path(
+                filepath, dpi=probe_dpi, first_page=number, last_page=number, grayscale=True
+            )[0])
+            char_height = self._estimate_char_height(probe)
+        except Exception as e:
+            print(f"⚠️ Sonde DPI impossible page {number}: {e}")
+            probe = char_height = None
+        
+        if not char_height:
+            return settings['dpi'], None, probe
+        
+        dpi = probe_dpi * settings['target_char_height'] / char_height
+        dpi = int(round(dpi / 25.0) * 25)  # Paliers de 25 dpi
+        dpi = max(settings['min_dpi'], min(settings['max_dpi'], dpi))
+        print(f"📐 Page {number}: hauteur d'x ~{char_height:.1f}px à {probe_dpi} dpi → rendu à {dpi} dpi")
+        return dpi, round(char_height, 2), probe
+    
+    def _estimate_char_height(self, gray) -> Optional[float]:
+        """Hauteur médiane des composantes connexes ressemblant à des caractères, ≈ hauteur d'x (None si trop peu)"""
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        
+        page_height = gray.shape[0]
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        # Exclure le bruit, les filets et les grands aplats (logos, photos)
+        is_glyph = (heights >= 3) & (heights <= page_height * 0.05) & \
+                   (widths <= heights * 3) & (areas >= 4)
+        
+        if int(is_glyph.sum()) < 20:
+            return None
+        return float(np.median(heights[is_glyph]))
+    
+    def _ocr_pages(self, pages: Iterable[Tuple[int, Any, Dict[str, Any]]], settings: Dict[str, Any],
+                   report: Dict[str, Any], page_count: Optional[int] = None) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        """OCR de pages (numéro, image en niveaux de gris, métadonnées) en parallèle ; résultats indexés par numéro de page"""
+        # Pages en parallèle ou blocs en parallèle dans chaque page, selon les pages et les cœurs du worker
+        plan = report['scheduler'] = self.scheduler.plan(page_count, settings)
+        parallelism = report['page_parallelism'] = plan['page_workers']
+        results = {}
+        # Réglages demandés (clés du cache par page) et réglages d'OCR (threads par page, langue du document)
+        ocr_settings = {**settings, 'region_workers': plan['region_workers']}
+        
+        pool = self._get_page_pool() if parallelism > 1 else None
+        if pool is None:
+            for number, image, page_meta in pages:
+                cached, cache_key = self._resolve_page_without_ocr(image, number, page_meta, settings)
+                if cached is not None:
+                    results[number] = cached
+                    continue
+                ocr_settings = self._resolve_document_language(image, ocr_settings, report)
+                print(f"📄 Traitement page {number}")
+                results[number] = _ocr_page(self, image, ocr_settings, number, page_meta)
+                self._store_page_cache(cache_key, results[number])
+        else:
+            # Au plus `parallelism` pages en cours : plafond par requête
+            pending = {}
+            try:
+                for number, image, page_meta in pages:
+                    cached, cache_key = self._resolve_page_without_ocr(image, number, page_meta, settings)
+                    if cached is not None:
+                        results[number] = cached
+                        continue
+                    ocr_settings = self._resolve_document_language(image, ocr_settings, report)
+                    print(f"📄 Envoi page {number} au pool OCR")
+                    future = pool.submit(_ocr_page_in_worker, image, ocr_settings, number, page_meta)
+                    pending[future] = (number, cache_key)
+                    if len(pending) >= parallelism:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            number, cache_key = pending.pop(future)
+                            results[number] = future.result()
+                            self._store_page_cache(cache_key, results[number])
+                for future in wait(pending).done:
+                    number, cache_key = pending[future]
+                    results[number] = future.result()
+                    self._store_page_cache(cache_key, results[number])
+            except BrokenProcessPool:
+                self._page_pool = None
+                raise
+        
+        # Pages blanches ignorées et statistiques du cache par page
+        blank_pages = sorted(n for n, (_, info) in results.items() if info.get('source') == 'blank')
+        report['blank_pages'] = blank_pages
+        if blank_pages:
+            print(f"⏭️ Pages blanches ignorées: {blank_pages}")
+        
+        hit_pages = sorted(n for n, (_, info) in results.items() if info.get('cache') == 'hit')
+        near_pages = sorted(n for n, (_, info) in results.items() if info.get('cache') == 'near_duplicate')
+        report['page_cache'] = {
+            'hits': len(hit_pages),
+            'near_duplicates': len(near_pages),
+            'misses': len(results) - len(hit_pages) - len(near_pages) - len(blank_pages),
+            'hit_pages': hit_pages,
+            'near_duplicate_pages': near_pages
+        }
+        if hit_pages or near_pages:
+            print(f"⚡ {len(hit_pages) + len(near_pages)}/{len(results)} pages servies depuis le cache OCR")
+        
+        return results
+    
+    def _resolve_document_language(self, image, settings: Dict[str, Any], report: Dict[str, Any]) -> Dict[str, Any]:
+        """Première page à OCRiser : détection de langue, décision réutilisée par les pages suivantes"""
+        if not settings.get('detect_language') or '+' not in settings['lang']:
+            return settings
+        start = time.perf_counter()
+        try:
+            detection = self._detect_language(image, settings)
+        except Exception as e:
+            # Simple optimisation : en cas d'échec, toutes les langues demandées
+            print(f"⚠️ Détection de langue impossible: {e}")
+            detection = {'lang': settings['lang'], 'error': str(e)}
+        detection['seconds'] = round(time.perf_counter() - start, 4)
+        report['language'] = detection
+        return {**settings, 'lang': detection['lang'], 'detect_language': False}
+    
+    def _detect_language(self, image, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Choisit la plus petite combinaison de langues à partir d'un échantillon de la page
+        
+        Une passe OCR sur une bande de quelques lignes (la plus dense en encre), puis
+        comptage des mots outils et des caractères propres à chaque langue candidate.
+        """
+        candidates = settings['lang'].split('+')
+        _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # Bande la plus encrée, haute de quelques lignes de texte
+        band = min(binary.shape[0], int(settings['language_sample_lines'] * settings['target_char_height'] * 3))
+        ink_rows = (binary < 128).sum(axis=1).astype(np.float64)
+        window = np.convolve(ink_rows, np.ones(band), mode='valid')
+        top = int(np.argmax(window)) if window.size else 0
+        sample = binary[top:top + band]
+        
+        result = self.engine.recognize(sample, lang=settings['lang'], psm=6, **self._engine_options(settings))
+        words = [w['text'].lower().strip('.,;:!?()«»"\'') for w in result['words'] if w['conf'] >= 50]
+        
+        scores = {}
+        for lang in candidates:
+            markers = LANGUAGE_MARKERS.get(lang)
+            if markers is None:
+                continue
+            scores[lang] = (sum(1 for word in words if word in markers['words'])
+                            + sum(1 for word in words if markers['chars'] & set(word)))
+        
+        # Langue unique seulement si toutes les candidates sont connues et l'une domine nettement
+        total = sum(scores.values())
+        lang = settings['lang']
+        if len(scores) == len(candidates) and len(words) >= settings['language_min_words'] and total >= 3:
+            best = max(scores, key=scores.get)
+            if scores[best] >= 0.8 * total:
+                lang = best
+        
+        print(f"🌐 Langue retenue: {lang} (échantillon de {len(words)} mots, scores {scores})")
+        return {'lang': lang, 'scores': scores, 'sample_words': len(words)}
+    
+    def _resolve_page_without_ocr(self, image, number: int, page_meta: Dict[str, Any],
+                                  settings: Dict[str, Any]) -> Tuple[Optional[Tuple[str, Dict[str, Any]]], Optional[str]]:
+        """Page blanche ou déjà en cache : résultat immédiat ; sinon (None, clé de cache)"""
+        if settings.get('skip_blank_pages'):
+            is_blank, ink_ratio = self._is_blank_page(image, settings)
+            if is_blank:
+                return ('', {**page_meta, 'page': number, 'source': 'blank', 'skipped': True,
+                             'ink_ratio': ink_ratio}), None
+        return self._lookup_page_cache(image, number, page_meta, settings)
+    
+    def _is_blank_page(self, gray, settings: Dict[str, Any]) -> Tuple[bool, float]:
+        """Test rapide de densité d'encre sur une vignette (marges exclues, poussières supprimées)"""
+        scale = min(1.0, 600.0 / max(gray.shape[:2]))
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        
+        # Ignorer les bords (ombres et bords de numérisation)
+        height, width = small.shape[:2]
+        margin_y, margin_x = height // 20, width // 20
+        inner = small[margin_y:height - margin_y, margin_x:width - margin_x]
+        if inner.size == 0:
+            return True, 0.0
+        
+        # Encre = nettement plus sombre que le fond (la réduction INTER_AREA dilue déjà les poussières isolées)
+        background = float(np.median(inner))
+        ink_ratio = float((inner < background - 40).mean())
+        
+        return ink_ratio < settings['blank_ink_ratio'], round(ink_ratio, 5)
+    
+    def _lookup_page_cache(self, image, number: int, page_meta: Dict[str, Any], settings: Dict[str, Any]) -> Tuple[Optional[Tuple[str, Dict[str, Any]]], Optional[str]]:
+        """Cherche l'OCR d'une page identique (mêmes pixels, mêmes réglages) ; retourne (résultat, clé)"""
+        if not settings.get('use_cache') or self.cache is None:
+            return None, None
+        
+        cache_key = make_key(hash_image(image), self._cache_settings(settings, PAGE_CACHE_NEUTRAL_SETTINGS))
+        cached = self.cache.get('page', cache_key)
+        status = 'hit'
+        if cached is None and settings.get('near_duplicates'):
+            cached, distance = self._lookup_near_duplicate(image, cache_key, settings)
+            status = 'near_duplicate'
+        if cached is None:
+            return None, cache_key
+        
+        page_text, page_info = cached
+        page_info.update({**page_meta, 'page': number, 'cache': status})
+        if status == 'near_duplicate':
+            page_info['near_duplicate_distance'] = distance
+            print(f"♻️ Page {number}: rescan d'une page déjà traitée (distance {distance}), OCR réutilisé")
+        return (page_text, page_info), cache_key
+    
+    def _lookup_near_duplicate(self, image, cache_key: str, settings: Dict[str, Any]) -> Tuple[Optional[list], Optional[int]]:
+        """Cherche une page quasi identique déjà OCRisée ; sinon indexe celle-ci sous cache_key"""
+        settings_key = make_key(self._cache_settings(settings, PAGE_CACHE_NEUTRAL_SETTINGS))
+        phash, signature = perceptual_hash(image), page_signature(image)
+        match = self.cache.find_near_duplicate(settings_key, phash, signature,
+                                               settings['near_duplicate_distance'],
+                                               settings['near_duplicate_max_pixels'])
+        if match is not None:
+            page_key, distance = match
+            cached = self.cache.get('page', page_key)
+            if cached is not None:
+                # Pas de copie sous la clé exacte de ce rescan : la réutilisation reste soumise à near_duplicates
+                return cached, distance
+        self.cache.add_near_duplicate(settings_key, phash, signature, cache_key)
+        return None, None
+    
+    def _store_page_cache(self, cache_key: Optional[str], result: Tuple[str, Dict[str, Any]]):
+        if cache_key is None or result[1].get('error'):
+            return  # Page en échec : retentée au prochain envoi
+        result[1]['cache'] = 'miss'
+        self.cache.set('page', cache_key, list(result))
+    
+    def _assemble_pages(self, results: Dict[int, Tuple[str, Dict[str, Any]]], report: Dict[str, Any]) -> str:
+        """Réassemble le texte des pages dans l'ordre avec les marqueurs de page"""
+        text = ""
+        for number in sorted(results):
+            page_text, page_info = results[number]
+            text += f"--- Page {number} ---\n{page_text}\n\n"
+            report['pages'].append(page_info)
+        
+        return text
+    
+    def _get_page_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Pool de processus OCR partagé par les requêtes de ce worker"""
+        if self._page_pool is None:
+            try:
+                # Un processus par cœur du worker ; épinglés un par cœur si l'épinglage est actif
+                workers = self.scheduler.cpu_budget
+                self._page_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_page_worker,
+                    initargs=(self.settings, self.scheduler.worker_cpus(), multiprocessing.Value('i', 0))
+                )
+                print(f"✅ Pool OCR créé ({workers} processus)")
+            except Exception as e:
+                print(f"⚠️ Pool OCR indisponible, traitement séquentiel: {e}")
+                return None
+        return self._page_pool
+    
+    def _extract_text_from_image(self, image_path, settings: Optional[Dict[str, Any]] = None,
+                                 page_info: Optional[Dict[str, Any]] = None) -> str:
+        """Extraction OCR avec prétraitement et configuration améliorés"""
+        settings = settings or self.settings
+        if page_info is None:
+            page_info = {}
+        timings = page_info.setdefault('timings', {})
+        start = time.perf_counter()
+        try:
+            # Charger l'image directement en niveaux de gris
+            gray = self._load_gray(image_path, settings, page_info)
+            if gray is None:
+                raise ValueError("image illisible")
+            start = _lap(timings, 'load', start)
 
             # 1. PRÉTRAITEMENT DE L'IMAGE
-            # Conversion en niveaux de gris
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # Redressement unique de la page (orientation + inclinaison)
+            if settings.get('deskew'):
+                gray = self._correct_orientation(gray, settings, page_info)
+                start = _lap(timings, 'deskew', start)
             
-            # Réduction du bruit
-            denoised = cv2.medianBlur(gray, 3)
+            if settings.get('binarization') == 'auto':
+                # Méthode de seuillage choisie par statistiques d'image (sans passe OCR)
+                binary_image = self._preprocess_image_enhanced(gray, page_info)
+            else:
+                # Réduction du bruit
+                denoised = cv2.medianBlur(gray, 3)
+                
+                # Seuillage automatique (Otsu)
+                _, binary_image = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            start = _lap(timings, 'binarize', start)
             
-            # Seuillage automatique (Otsu)
-            _, binary_image = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            # Tableaux à filets : OCR cellule par cellule, puis zone masquée pour l'OCR du texte courant
+            # Dimensions du repère des boîtes de mots (page redressée)
+            page_info['height'], page_info['width'] = binary_image.shape[:2]
+            tables = []
+            table_words = []
+            if settings.get('table_detection'):
+                grids = detect_ruled_tables(binary_image)
+                if grids:
+                    tables, table_words = self._ocr_table_grids(binary_image, grids, settings)
+                    # Seules les grilles devenues tableaux sont retirées de l'OCR du texte courant
+                    binary_image = binary_image.copy()
+                    for x, y, w, h in (table['bbox'] for table in tables):
+                        binary_image[y:y + h, x:x + w] = 255
+                    page_info['tables'] = tables
+                start = _lap(timings, 'tables', start)
             
             # 2. CONFIGURATION ET OCR
-            # Essayer différents modes de segmentation
-            configs = ['--psm 6', '--psm 11', '--psm 3']
-            best_text = ""
-            for config in configs:
-                current_text = pytesseract.image_to_string(binary_image, config=f'{config} -l fra+eng')
-                if len(current_text.strip()) > len(best_text.strip()):
-                    best_text = current_text
-                    print(f"✅ Texte extrait avec {config}: {len(current_text)} caractères")
+            if settings.get('ocr_mode') == 'multi_pass':
+                # Essayer différents modes de segmentation
+                psm_modes = [6, 11, 3]
+                best_text = ""
+                for psm in psm_modes:
+                    current_text = self.engine.image_to_string(binary_image, lang=settings['lang'], psm=psm,
+                                                               **self._engine_options(settings))
+                    if len(current_text.strip()) > len(best_text.strip()):
+                        best_text = current_text
+                        print(f"✅ Texte extrait avec --psm {psm}: {len(current_text)} caractères")
+                page_info.update({'ocr_path': 'multi_pass', 'passes': len(psm_modes)})
+            else:
+                regions = self._detect_text_regions(binary_image) if settings.get('region_ocr') else []
+                if self._should_ocr_regions(regions, binary_image.shape):
+                    result = self._ocr_regions(binary_image, regions, settings)
+                else:
+                    result = self._ocr_with_fallback(binary_image, settings)
+                best_text = result['text']
+                page_info.update({k: v for k, v in result.items() if k not in ('text', 'words')})
+                # Mots, boîtes et confiances de la passe retenue (exports hOCR/ALTO/TSV sans nouvel OCR)
+                last_block = max((word['block'] for word in result['words']), default=0)
+                page_info['words'] = result['words'] + [{**word, 'block': word['block'] + last_block}
+                                                        for word in table_words]
+            _lap(timings, 'ocr', start)
+            
+            # Texte des tableaux ajouté en colonnes séparées par « | » (lisible par les parsers texte)
+            for table in tables:
+                table_lines = [' | '.join(row) for row in [table['headers']] + table['rows']]
+                best_text = best_text.rstrip('\n') + '\n\n' + '\n'.join(table_lines) + '\n'
 
             return best_text if best_text.strip() else "Aucun texte détecté dans l'image après prétraitement."
 
         except Exception as e:
+            # Échec signalé sur la page : ni cache de page, ni cache de document
+            page_info['error'] = str(e)
             return f"Erreur lors de l'extraction OCR: {e}"
     
-    def _preprocess_image_enhanced(self, image):
-        """Prétraitement amélioré pour l'OCR"""
+    def _load_gray(self, image_input, settings: Optional[Dict[str, Any]] = None,
+                   page_info: Optional[Dict[str, Any]] = None):
+        """Image en niveaux de gris depuis un chemin, un tampon mémoire, une image PIL ou un tableau RGB
+        
+        Les tampons sont décodés sur place (cv2.imdecode) : ni fichier temporaire, ni passage par la couleur.
+        Les JPEG surdimensionnés sont décodés directement à résolution réduite (voir _load_jpeg_reduced).
+        """
+        if settings is not None and settings.get('jpeg_reduced_decode') and self._is_jpeg(image_input):
+            return self._load_jpeg_reduced(image_input, settings, page_info if page_info is not None else {})
+        if isinstance(image_input, (bytes, bytearray, memoryview)):
+            return cv2.imdecode(np.frombuffer(image_input, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if isinstance(image_input, str):
+            return cv2.imread(image_input, cv2.IMREAD_GRAYSCALE)
+        
+        image = np.asarray(image_input)
+        if image.ndim == 3:
+            return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+        return image
+    
+    def _is_jpeg(self, image_input) -> bool:
+        if isinstance(image_input, (bytes, bytearray, memoryview)):
+            return bytes(image_input[:3]) == b'\xff\xd8\xff'
+        return isinstance(image_input, str) and image_input.lower().endswith(('.jpg', '.jpeg'))
+    
+    def _load_jpeg_reduced(self, image_input, settings: Dict[str, Any], page_info: Dict[str, Any]):
+        """Décode un JPEG directement à l'échelle 1, 1/2, 1/4 ou 1/8 (mise à l'échelle DCT de libjpeg)
+        
+        Une sonde à 1/8 (quasi gratuite) mesure la hauteur des caractères : la plus forte
+        réduction qui les garde au-dessus de target_char_height est retenue. Si le texte n'est
+        pas mesurable, la réduction garde le grand côté au-dessus de max_image_side.
+        """
+        reduced_flags = {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                         8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+        
+        def decode(flag):
+            if isinstance(image_input, str):
+                return cv2.imread(image_input, flag)
+            return cv2.imdecode(np.frombuffer(image_input, np.uint8), flag)
+        
+        probe = decode(reduced_flags[8])
+        if probe is None:
+            return None
+        char_height = self._estimate_char_height(probe)
+        long_side = max(probe.shape[:2]) * 8
+        
+        factor = 1
+        for candidate in (8, 4, 2):
+            if char_height:
+                fits = char_height * 8 / candidate >= settings['target_char_height']
+            else:
+                fits = long_side / candidate >= settings['max_image_side']
+            if fits:
+                factor = candidate
+                break
+        
+        page_info['decode_reduction'] = factor
+        if char_height:
+            page_info['probe_char_height'] = round(char_height * 8, 2)
+        if factor == 8:
+            return probe
+        if factor > 1:
+            print(f"📷 JPEG ~{long_side}px décodé à 1/{factor} (caractères ~{(char_height or 0) * 8 / factor:.0f}px)")
+        return decode(reduced_flags[factor] if factor > 1 else cv2.IMREAD_GRAYSCALE)
+    
+    def _correct_orientation(self, gray, settings: Dict[str, Any], page_info: Dict[str, Any]):
+        """Détecte orientation et inclinaison sur une vignette puis tourne la page une seule fois"""
+        scale = min(1.0, 1200.0 / max(gray.shape[:2]))
+        thumbnail = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        
+        # 1. Orientation 0/90/180/270 (OSD Tesseract)
+        rotate = 0
+        try:
+            osd = self.engine.detect_orientation(thumbnail)
+            if osd['confidence'] >= settings['osd_min_confidence']:
+                rotate = osd['rotate']
+        except Exception as e:
+            print(f"⚠️ OSD indisponible: {e}")
+        
+        rotations = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+        if rotate in rotations:
+            thumbnail = cv2.rotate(thumbnail, rotations[rotate])
+        
+        # 2. Inclinaison résiduelle (profil de projection)
+        skew = self._estimate_skew(thumbnail, settings['max_skew'])
+        page_info['orientation'] = rotate
+        page_info['skew_angle'] = skew
+        
+        if rotate in rotations:
+            gray = cv2.rotate(gray, rotations[rotate])
+        if abs(skew) >= 0.2:
+            height, width = gray.shape[:2]
+            matrix = cv2.getRotationMatrix2D((width / 2.0, height / 2.0), skew, 1.0)
+            gray = cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                  borderMode=cv2.BORDER_REPLICATE)
+            # Repère des boîtes de mots : la couche texte du PDF interrogeable applique l'inverse
+            page_info['deskew_matrix'] = [[round(float(v), 6) for v in row] for row in matrix]
+        if rotate or abs(skew) >= 0.2:
+            print(f"📐 Page redressée: rotation {rotate}°, inclinaison {skew:.2f}°")
+        
+        return gray
+    
+    def _estimate_skew(self, gray, max_skew: float) -> float:
+        """Angle (degrés) qui maximise la variance du profil horizontal des lignes de texte"""
+        _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        if cv2.countNonZero(ink) > ink.size / 2:
+            ink = cv2.bitwise_not(ink)
+        if cv2.countNonZero(ink) == 0:
+            return 0.0
+        
+        height, width = ink.shape[:2]
+        center = (width / 2.0, height / 2.0)
+        
+        def profile_score(angle: float) -> float:
+            matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+            rotated = cv2.warpAffine(ink, matrix, (width, height), flags=cv2.INTER_NEAREST)
+            return float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+        
+        # Recherche grossière (1°) puis fine (0.1°)
+        best = max(np.arange(-max_skew, max_skew + 0.5, 1.0), key=profile_score)
+        best = max(np.arange(best - 1.0, best + 1.05, 0.1), key=profile_score)
+        return round(float(best), 2) + 0.0  # Évite -0.0
+    
+    def _detect_text_regions(self, binary_image) -> List[Tuple[int, int, int, int]]:
+        """Blocs de texte (x, y, largeur, hauteur) par morphologie, triés dans l'ordre de lecture"""
+        _, ink = cv2.threshold(binary_image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        if cv2.countNonZero(ink) > ink.size / 2:  # Texte clair sur fond sombre
+            ink = cv2.bitwise_not(ink)
+        height, width = ink.shape[:2]
+        
+        # Fusionner les caractères en blocs : noyau proportionnel à la taille des glyphes
+        char_height = max(self._estimate_char_height(binary_image) or 0, height / 200.0, 6)
+        kernel = cv2.getStructuringElement(
+            cv2.MORPH_RECT, (max(3, int(char_height * 2)), max(3, int(char_height * 1.5)))
+        )
+        blocks = cv2.dilate(ink, kernel, iterations=1)
+        contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w < char_height or h < char_height * 0.6:
+                continue  # Poussière
+            density = cv2.countNonZero(ink[y:y + h, x:x + w]) / float(w * h)
+            if density < 0.02 or density > 0.5:
+                continue  # Vide ou aplat (photo, logo plein)
+            regions.append((x, y, w, h))
+        
+        # Ordre de lecture : bandes horizontales de haut en bas, puis de gauche à droite
+        band = max(1, int(char_height * 2))
+        regions.sort(key=lambda r: (r[1] // band, r[0]))
+        return regions
+    
+    def _should_ocr_regions(self, regions: List[Tuple[int, int, int, int]], shape) -> bool:
+        """OCR par blocs seulement s'il évite une part notable de la page ou s'il peut être parallélisé"""
+        if not regions:
+            return False
+        page_area = float(shape[0] * shape[1])
+        region_area = sum(w * h for _, _, w, h in regions)
+        return len(regions) > 1 or region_area / page_area < 0.8
+    
+    def _ocr_regions(self, binary_image, regions: List[Tuple[int, int, int, int]],
+                     settings: Dict[str, Any]) -> Dict[str, Any]:
+        """OCR des blocs détectés (en parallèle) puis recollage du texte et des mots dans l'ordre de lecture"""
+        height, width = binary_image.shape[:2]
+        pad = 8
+        crops = []
+        for x, y, w, h in regions:
+            x0, y0 = max(0, x - pad), max(0, y - pad)
+            x1, y1 = min(width, x + w + pad), min(height, y + h + pad)
+            crops.append((x0, y0, binary_image[y0:y1, x0:x1]))
+        
+        crop_results, workers = self._run_in_batches(self._ocr_crop_batch, crops, settings)
+        
+        # Recollage : texte bloc par bloc, mots ramenés dans le repère de la page
+        texts = []
+        words = []
+        block_ids = {}
+        passes = 0
+        for (x0, y0, _), result in zip(crops, crop_results):
+            passes += result['passes']
+            if result['text'].strip():
+                texts.append(result['text'].strip())
+            for word in result['words']:
+                block = block_ids.setdefault((x0, y0, word['block']), len(block_ids) + 1)
+                words.append({**word, 'left': word['left'] + x0, 'top': word['top'] + y0, 'block': block})
+        
+        mean_confidence, coverage = self._score_ocr_result(words, binary_image)
+        print(f"✅ OCR par blocs ({len(crops)} blocs, {workers} threads): confiance {mean_confidence:.1f}")
+        
+        return {
+            'text': '\n\n'.join(texts) + '\n' if texts else '',
+            'words': words,
+            'ocr_path': 'regions',
+            'regions': len(crops),
+            'region_workers': workers,
+            'mean_confidence': round(mean_confidence, 2),
+            'coverage': round(coverage, 3),
+            'passes': passes
+        }
+    
+    def _ocr_table_grids(self, binary_image, grids: List[Dict[str, Any]],
+                         settings: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """OCR des cellules de chaque grille (lots parallèles, cellules vides ignorées) ; retourne (tableaux, mots)"""
+        # Encre mesurée sur un masque Otsu : l'image peut rester en niveaux de gris (binarisation 'original')
+        ink = ink_mask(binary_image)
+        cells = []
+        for t, grid in enumerate(grids):
+            for i, j, x0, y0, x1, y1 in grid_cells(grid):
+                ink_ratio = cv2.countNonZero(ink[y0:y1, x0:x1]) / ((y1 - y0) * (x1 - x0))
+                if ink_ratio >= settings.get('table_cell_min_ink', 0.005):
+                    cells.append((t, i, j, x0, y0, binary_image[y0:y1, x0:x1]))
+        
+        cell_results, workers = self._run_in_batches(self._ocr_cell_batch, cells, settings)
+        
+        # Grilles remplies ; les cellules vides restent des chaînes vides
+        # Mots ramenés dans le repère de la page, un bloc par cellule
+        contents = [[[''] * (len(grid['col_lines']) - 1) for _ in range(len(grid['row_lines']) - 1)]
+                    for grid in grids]
+        words = []
+        for block, ((t, i, j, x0, y0, _), result) in enumerate(zip(cells, cell_results), start=1):
+            contents[t][i][j] = ' '.join(result['text'].split())
+            words.extend({**word, 'left': word['left'] + x0, 'top': word['top'] + y0, 'block': block}
+                         for word in result['words'])
+        
+        tables = []
+        for grid, rows in zip(grids, contents):
+            table = self._process_table_data([row for row in rows if any(row)])
+            if table:
+                table.update({'source': 'grid', 'bbox': list(grid['bbox'])})
+                tables.append(table)
+        print(f"📊 Tableaux à filets: {len(tables)} ({len(cells)} cellules OCR, {workers} threads)")
+        return tables, words
+    
+    def _ocr_cell_batch(self, cells: List[Tuple[int, int, int, int, int, Any]],
+                        settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = []
+        for *_, crop in cells:
+            # Une ligne par cellule (psm 7) ; bloc (psm 6) pour les cellules hautes à plusieurs lignes
+            psm = 7 if crop.shape[0] < 4 * settings.get('target_char_height', 21) else 6
+            results.append(self.engine.recognize(crop, lang=settings['lang'], psm=psm,
+                                                 **self._engine_options(settings)))
+        return results
+    
+    def _run_in_batches(self, batch_function, items: List[Any], settings: Dict[str, Any]) -> Tuple[List[Any], int]:
+        """Répartit les éléments en lots traités en parallèle sur les threads persistants ; résultats dans l'ordre"""
+        workers = min(len(items), settings.get('region_workers') or self.scheduler.cpu_budget)
+        if workers <= 1:
+            return batch_function(items, settings), max(workers, 1)
+        
+        if self._region_pool is None:
+            self._region_pool = ThreadPoolExecutor(max_workers=self.scheduler.cpu_budget)
+        batches = [list(range(len(items)))[i::workers] for i in range(workers)]
+        futures = [self._region_pool.submit(batch_function, [items[j] for j in batch], settings)
+                   for batch in batches]
+        results = [None] * len(items)
+        for batch, future in zip(batches, futures):
+            for j, result in zip(batch, future.result()):
+                results[j] = result
+        return results, workers
+    
+    def _ocr_crop_batch(self, crops: List[Tuple[int, int, Any]], settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [self._ocr_with_fallback(crop, settings) for _, _, crop in crops]
+    
+    def _ocr_with_fallback(self, binary_image, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Une passe OCR avec confiances ; autre segmentation seulement si le résultat est faible"""
+        attempts = []
+        best = None
+        
+        for psm in [settings['psm']] + list(settings.get('fallback_psm') or []):
+            result = self.engine.recognize(binary_image, lang=settings['lang'], psm=psm,
+                                           **self._engine_options(settings))
+            mean_confidence, coverage = self._score_ocr_result(result['words'], binary_image)
+            attempts.append({'psm': psm, 'mean_confidence': mean_confidence, 'coverage': coverage})
+            
+            score = mean_confidence * coverage
+            if best is None or score > best['score']:
+                best = {**result, 'psm': psm, 'mean_confidence': mean_confidence,
+                        'coverage': coverage, 'score': score}
+            
+            if mean_confidence >= settings['min_confidence'] and coverage >= settings['min_coverage']:
+                break
+            print(f"⚠️ psm {psm}: confiance {mean_confidence:.1f}, couverture {coverage:.2f} - essai d'une autre segmentation")
+        
+        path = 'single_pass' if len(attempts) == 1 else f"fallback_psm_{best['psm']}"
+        print(f"✅ OCR ({path}): confiance {best['mean_confidence']:.1f}, couverture {best['coverage']:.2f}")
+        
+        return {
+            'text': best['text'],
+            'words': best['words'],
+            'ocr_path': path,
+            'psm': best['psm'],
+            'mean_confidence': round(best['mean_confidence'], 2),
+            'coverage': round(best['coverage'], 3),
+            'passes': len(attempts),
+            'attempts': attempts
+        }
+    
+    def _engine_options(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Variables Tesseract (jeu de caractères du profil) et répertoire des modèles LSTM"""
+        options = {}
+        if settings.get('char_whitelist'):
+            options['variables'] = {'tessedit_char_whitelist': settings['char_whitelist']}
+        tessdata = TESSDATA_DIRS.get(settings.get('tessdata_model'))
+        if tessdata and os.path.isdir(tessdata):
+            options['tessdata'] = tessdata
+        return options
+    
+    def _score_ocr_result(self, words: List[Dict[str, Any]], binary_image) -> tuple:
+        """Confiance moyenne des mots et part de l'encre couverte par les boîtes de mots"""
+        confidences = [w['conf'] for w in words if w['conf'] >= 0]
+        mean_confidence = float(np.mean(confidences)) if confidences else 0.0
+        
+        ink = binary_image < 128
+        if ink.mean() > 0.5:  # Texte clair sur fond sombre
+            ink = ~ink
+        total_ink = int(ink.sum())
+        if total_ink == 0:
+            return mean_confidence, 1.0
+        
+        covered = np.zeros_like(ink)
+        for w in words:
+            covered[w['top']:w['top'] + w['height'], w['left']:w['left'] + w['width']] = True
+        coverage = int((ink & covered).sum()) / total_ink
+        
+        return mean_confidence, coverage
+    
+    def _preprocess_image_enhanced(self, image, page_info: Optional[Dict[str, Any]] = None):
+        """Prétraitement amélioré pour l'OCR (choix du seuillage sans passe OCR)"""
         try:
             # Convertir en niveaux de gris
             if len(image.shape) == 3:
@@ -879,60 +2107,101 @@ class OCRProcessor:
             else:
                 gray = image
             
-            # 1. Débruitage
-            denoised = cv2.medianBlur(gray, 3)
-            
-            # 2. Amélioration du contraste (CLAHE)
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-            contrast_enhanced = clahe.apply(denoised)
-            
-            # 3. Seuillage adaptatif multiple
-            # Méthode 1: Gaussian
-            thresh1 = cv2.adaptiveThreshold(
-                contrast_enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 15, 5
-            )
-            
-            # Méthode 2: Mean
-            thresh2 = cv2.adaptiveThreshold(
-                contrast_enhanced, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
-                cv2.THRESH_BINARY, 15, 5
-            )
-            
-            # Méthode 3: Otsu
-            _, thresh3 = cv2.threshold(contrast_enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            # 1. Choix de la méthode sur une copie réduite (statistiques d'image uniquement)
+            method, metrics = self._select_binarization(gray)
+            print(f"✅ Meilleure méthode: {method} - {metrics}")
+            if page_info is not None:
+                page_info['binarization'] = method
+                page_info['binarization_metrics'] = metrics
             
-            # 4. Test rapide pour trouver la meilleure méthode
-            images_to_test = [
-                ('gaussian', thresh1),
-                ('mean', thresh2), 
-                ('otsu', thresh3),
-                ('original', gray)
-            ]
+            if method == 'original':
+                return gray
             
-            best_image = gray
-            best_score = 0
-            
-            for name, img in images_to_test:
-                try:
-                    # Test OCR rapide
-                    text = pytesseract.image_to_string(img, config='--psm 6 -l fra')
-                    score = len(text.strip())
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_image = img
-                        print(f"✅ Meilleure méthode: {name} - {score} caractères")
-                        
-                except Exception as e:
-                    print(f"⚠️ Erreur méthode {name}: {e}")
-                    continue
-            
-            return best_image
+            # 2. Seule la variante retenue est calculée en pleine résolution
+            return self._binarize_variant(gray, method, block_size=15)
             
         except Exception as e:
             print(f"❌ Erreur prétraitement: {e}")
             return image
+    
+    def _binarize_variant(self, gray, method: str, block_size: int):
+        """Débruitage + CLAHE puis seuillage gaussian / mean / otsu"""
+        denoised = cv2.medianBlur(gray, 3)
+        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+        contrast_enhanced = clahe.apply(denoised)
+        
+        if method == 'gaussian':
+            return cv2.adaptiveThreshold(contrast_enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                         cv2.THRESH_BINARY, block_size, 5)
+        if method == 'mean':
+            return cv2.adaptiveThreshold(contrast_enhanced, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                         cv2.THRESH_BINARY, block_size, 5)
+        _, binary = cv2.threshold(contrast_enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
+    
+    def _select_binarization(self, gray, max_side: int = 1000) -> Tuple[str, Dict[str, float]]:
+        """Choisit gaussian / mean / otsu / original d'après des statistiques calculées sur une copie réduite"""
+        scale = min(1.0, max_side / float(max(gray.shape[:2])))
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        block_size = max(3, int(15 * scale) | 1)
+        
+        # Séparabilité d'Otsu : variance inter-classes / variance totale (1 = histogramme bimodal net)
+        hist = cv2.calcHist([small], [0], None, [256], [0, 256]).ravel() / small.size
+        levels = np.arange(256)
+        total_mean = float((hist * levels).sum())
+        total_var = float((hist * (levels - total_mean) ** 2).sum())
+        weights = np.cumsum(hist)
+        means = np.cumsum(hist * levels)
+        valid = (weights > 1e-6) & (weights < 1 - 1e-6)
+        between = (total_mean * weights[valid] - means[valid]) ** 2 / (weights[valid] * (1 - weights[valid]))
+        separability = float(between.max() / total_var) if total_var > 0 and between.size else 0.0
+        
+        # Éclairage irrégulier : dispersion du fond estimé par un flou large
+        background = cv2.medianBlur(small, 31 if min(small.shape[:2]) > 62 else 3)
+        unevenness = float(background.std() / 255.0)
+        
+        metrics = {'separability': round(separability, 3), 'unevenness': round(unevenness, 3)}
+        
+        qualities = {
+            method: self._binary_quality(self._binarize_variant(small, method, block_size))
+            for method in ('gaussian', 'mean', 'otsu')
+        }
+        
+        # Document déjà propre (bimodal, fond uniforme, sans bruit) : Tesseract seuille très bien lui-même
+        if separability >= 0.9 and unevenness < 0.03 and qualities['otsu'][0] < 0.02:
+            return 'original', metrics
+        
+        best_method, best_score = 'otsu', -1.0
+        for method, (speckle, stroke_cv) in qualities.items():
+            score = (1.0 - speckle) / (1.0 + stroke_cv)
+            if method == 'otsu':
+                # Seuil global : bon si l'histogramme est bimodal, mauvais sous éclairage irrégulier
+                score *= (0.5 + 0.5 * separability) * max(0.2, 1.0 - 4.0 * unevenness)
+            metrics[method] = round(score, 3)
+            if score > best_score:
+                best_method, best_score = method, score
+        
+        return best_method, metrics
+    
+    def _binary_quality(self, binary) -> Tuple[float, float]:
+        """(part de composantes parasites, coefficient de variation de l'épaisseur des traits)"""
+        ink = (binary < 128).astype(np.uint8)
+        if ink.mean() > 0.5:
+            ink = 1 - ink
+        
+        count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        if count <= 1:
+            return 1.0, 1.0
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        speckle = float((areas <= 3).sum()) / len(areas)
+        
+        # Épaisseur des traits : maxima locaux de la transformée de distance
+        dist = cv2.distanceTransform(ink, cv2.DIST_L2, 3)
+        ridge = (dist > 0) & (dist >= cv2.dilate(dist, np.ones((3, 3), np.uint8)))
+        widths = dist[ridge]
+        stroke_cv = float(widths.std() / widths.mean()) if widths.size and widths.mean() > 0 else 1.0
+        
+        return speckle, stroke_cv
 
     def _preprocess_image(self, image):
         """Ancienne méthode de prétraitement (conservée pour compatibilité)"""
@@ -1105,3 +2374,31 @@ class OCRProcessor:
                 current_table = []
         
         return tables
+
+
+# === OCR DES PAGES DANS LES PROCESSUS DU POOL ===
+_worker_processor = None
+
+def _init_page_worker(settings: Dict[str, Any], cpus: Optional[List[int]] = None, counter=None):
+    """Initialise un OCRProcessor (et son moteur) par processus du pool, épinglé sur un cœur si demandé"""
+    global _worker_processor
+    if cpus and counter is not None:
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        try:
+            os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+        except OSError as e:
+            print(f"⚠️ Épinglage du processus OCR impossible: {e}")
+    _worker_processor = OCRProcessor(verify_installation=False, **settings)
+
+def _ocr_page(processor: OCRProcessor, image, settings: Dict[str, Any], number: int,
+              page_meta: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    """OCR d'une page : retourne (texte, informations de page)"""
+    page_info = {'page': number, 'source': 'ocr', **(page_meta or {})}
+    page_text = processor._extract_text_from_image(image, settings, page_info)
+    return page_text, page_info
+
+def _ocr_page_in_worker(image, settings: Dict[str, Any], number: int,
+                        page_meta: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    return _ocr_page(_worker_processor, image, settings, number, page_meta)
@@ -0,0 +1,160 @@
+"""Répartition des cœurs entre workers web, pages, blocs et threads OpenMP de Tesseract.
+
+Trois niveaux de parallélisme se cumulent sur un nœud : les workers gunicorn,
+les pages OCRisées en parallèle (pool de processus) et les blocs/cellules d'une
+même page (threads). Tesseract ajoute ses propres threads OpenMP. Sans
+arbitrage, le produit dépasse largement le nombre de cœurs : l'ordonnanceur
+donne à chaque worker web une part fixe des cœurs et décide, document par
+document, comment la dépenser (voir OCRProcessor._ocr_pages).
+
+Ce module doit être importé avant le moteur OCR : OMP_THREAD_LIMIT n'est lu
+qu'au chargement de libtesseract (voir configure_openmp).
+"""
+import os
+from typing import Dict, List, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Hors Linux/Unix : pas d'épinglage
+    fcntl = None
+
+# throughput : débit sous charge (1 thread par page, OpenMP désactivé)
+# latency : latence d'une requête isolée (threads par page et OpenMP limité)
+SCHEDULER_POLICIES = ('throughput', 'latency')
+MAX_OMP_THREADS = 4  # Au-delà, l'OpenMP de Tesseract ne gagne presque plus rien
+
+
+def available_cpus() -> int:
+    """Nombre de cœurs réellement utilisables par ce processus"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def server_workers() -> int:
+    """Requêtes OCR simultanées sur le nœud : workers gunicorn (WEB_CONCURRENCY) sauf réglage explicite"""
+    value = os.environ.get('OCR_SERVER_WORKERS') or os.environ.get('WEB_CONCURRENCY') or 1
+    return max(1, int(value))
+
+
+def scheduler_policy() -> str:
+    policy = os.environ.get('OCR_SCHEDULER_POLICY', 'throughput').lower()
+    return policy if policy in SCHEDULER_POLICIES else 'throughput'
+
+
+def configure_openmp() -> int:
+    """Fixe OMP_THREAD_LIMIT pour libtesseract et les processus tesseract (valeur explicite respectée)"""
+    if not os.environ.get('OMP_THREAD_LIMIT'):
+        budget = max(1, available_cpus() // server_workers())
+        limit = 1 if scheduler_policy() == 'throughput' else min(MAX_OMP_THREADS, budget)
+        os.environ['OMP_THREAD_LIMIT'] = str(limit)
+    return int(os.environ['OMP_THREAD_LIMIT'])
+
+
+# Avant tout chargement de libtesseract (tesserocr) ou lancement de tesseract
+OMP_THREAD_LIMIT = configure_openmp()
+
+
+class OCRScheduler:
+    """Part des cœurs de ce worker web et plan de parallélisme de chaque document"""
+
+    def __init__(self, policy: Optional[str] = None, pin_cpus: Optional[bool] = None,
+                 slots_path: Optional[str] = None):
+        self.policy = policy if policy in SCHEDULER_POLICIES else scheduler_policy()
+        self.pin_cpus = (os.environ.get('OCR_PIN_CPUS', '0') != '0') if pin_cpus is None else pin_cpus
+        self.slots_path = slots_path or os.environ.get('OCR_CPU_SLOTS_PATH', os.path.join('cache', 'cpu_slots'))
+        self.server_workers = server_workers()
+        # Tranche de cœurs attribuée (épinglage) : réservée au premier plan, dans le worker lui-même
+        self._slot = None
+        self._slot_file = None
+        self._slot_pid = None
+        self._cpus = None
+
+    @property
+    def cpu_budget(self) -> int:
+        """Cœurs dont dispose ce worker web (sa tranche s'il est épinglé)"""
+        if self._cpus:
+            return len(self._cpus)
+        return max(1, available_cpus() // self.server_workers)
+
+    def worker_cpus(self) -> List[int]:
+        """Cœurs sur lesquels épingler les processus du pool de pages (vide sans épinglage)"""
+        self._claim_cpus()
+        return list(self._cpus or [])
+
+    def _claim_cpus(self):
+        """Réserve une tranche de cœurs (verrou par tranche, libéré à la mort du worker) et s'y épingle"""
+        if not self.pin_cpus or fcntl is None or self._slot_pid == os.getpid():
+            return
+        self._slot_pid = os.getpid()
+        self._slot = self._slot_file = self._cpus = None
+        try:
+            cpus = sorted(os.sched_getaffinity(0))
+            budget = max(1, len(cpus) // self.server_workers)
+            os.makedirs(self.slots_path, exist_ok=True)
+            for slot in range(len(cpus) // budget):
+                slot_file = open(os.path.join(self.slots_path, f'{slot}.lock'), 'w')
+                try:
+                    fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    slot_file.close()
+                    continue
+                self._slot, self._slot_file = slot, slot_file
+                self._cpus = cpus[slot * budget:(slot + 1) * budget]
+                # Thread courant ; les threads et processus créés ensuite en héritent
+                os.sched_setaffinity(0, self._cpus)
+                print(f"📌 Worker {os.getpid()} épinglé sur les cœurs {self._cpus} (tranche {slot})")
+                return
+            print("⚠️ Aucune tranche de cœurs libre - worker non épinglé")
+        except (AttributeError, OSError) as e:
+            print(f"⚠️ Épinglage des cœurs impossible: {e}")
+
+    def plan(self, page_count: Optional[int], settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Parallélisme d'un document : entre pages (pool de processus) ou dans la page (threads par bloc)
+
+        Plusieurs pages : une page par cœur, le pool évite la contention entre handles
+        Tesseract ; en mode débit, un seul thread par page. Une seule page : les blocs
+        et cellules se partagent les cœurs du worker.
+        """
+        self._claim_cpus()
+        budget = self.cpu_budget
+        cap = int(settings.get('max_parallel_pages') or 0)
+        page_workers = min(budget, cap) if cap > 0 else budget
+        if page_count is not None:
+            page_workers = min(page_workers, page_count)
+        page_workers = max(1, page_workers)
+
+        if page_workers > 1:
+            mode = 'inter_page'
+            threads = 1 if self.policy == 'throughput' or self._cpus else max(1, budget // page_workers)
+        else:
+            mode = 'intra_page' if budget > 1 else 'serial'
+            threads = budget
+        if settings.get('region_workers'):
+            threads = int(settings['region_workers'])
+
+        return {
+            'mode': mode,
+            'policy': self.policy,
+            'cpu_budget': budget,
+            'page_workers': page_workers,
+            'region_workers': threads,
+            'omp_thread_limit': OMP_THREAD_LIMIT,
+            'pinned_cpus': list(self._cpus) if self._cpus else None,
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Décisions de l'ordonnanceur pour ce worker (exposées par /api/scheduler)"""
+        self._claim_cpus()
+        return {
+            'policy': self.policy,
+            'node_cpus': os.cpu_count(),
+            'server_workers': self.server_workers,
+            'cpu_budget': self.cpu_budget,
+            'omp_thread_limit': OMP_THREAD_LIMIT,
+            'pin_cpus': self.pin_cpus,
+            'slot': self._slot,
+            'pinned_cpus': list(self._cpus) if self._cpus else None,
+            'worker_pid': os.getpid(),
+        }
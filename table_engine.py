@@ -0,0 +1,82 @@
+"""Détection des tableaux à filets (budgets, effectifs) au niveau de l'image.
+
+Les filets horizontaux et verticaux sont isolés par morphologie, puis leurs
+positions donnent directement la grille des cellules. L'OCR se fait ensuite
+cellule par cellule (voir OCRProcessor._ocr_table_grids).
+"""
+from typing import Dict, List, Any, Tuple
+
+import cv2
+import numpy as np
+
+
+def ink_mask(image) -> np.ndarray:
+    """Masque de l'encre (255) quelle que soit la polarité de l'image"""
+    _, ink = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if cv2.countNonZero(ink) > ink.size / 2:
+        ink = cv2.bitwise_not(ink)
+    return ink
+
+
+def _line_positions(profile: np.ndarray, min_length: float) -> List[int]:
+    """Centres des suites de positions dont le profil dépasse min_length (un filet = une suite)"""
+    positions = []
+    run_start = None
+    for index, is_line in enumerate(profile >= min_length):
+        if is_line and run_start is None:
+            run_start = index
+        elif not is_line and run_start is not None:
+            positions.append((run_start + index - 1) // 2)
+            run_start = None
+    if run_start is not None:
+        positions.append((run_start + len(profile) - 1) // 2)
+    return positions
+
+
+def detect_ruled_tables(image, min_rows: int = 2, min_cols: int = 2) -> List[Dict[str, Any]]:
+    """Repère les tableaux à filets ; retourne pour chacun sa boîte et les positions des filets"""
+    ink = ink_mask(image)
+    height, width = ink.shape[:2]
+
+    # Filets : segments longs et fins (les caractères ne survivent pas à l'ouverture)
+    horizontal = cv2.morphologyEx(ink, cv2.MORPH_OPEN,
+                                  cv2.getStructuringElement(cv2.MORPH_RECT, (max(20, width // 40), 1)))
+    vertical = cv2.morphologyEx(ink, cv2.MORPH_OPEN,
+                                cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(20, height // 60))))
+
+    grid = cv2.dilate(cv2.bitwise_or(horizontal, vertical), np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(grid, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    tables = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w < width * 0.15 or h < height * 0.02:
+            continue
+
+        # Un filet doit traverser une bonne part du tableau (cellules fusionnées tolérées)
+        row_lines = _line_positions((horizontal[y:y + h, x:x + w] > 0).sum(axis=1), w * 0.4)
+        col_lines = _line_positions((vertical[y:y + h, x:x + w] > 0).sum(axis=0), h * 0.4)
+        if len(row_lines) < min_rows + 1 or len(col_lines) < min_cols + 1:
+            continue  # Simple cadre ou filet isolé
+
+        tables.append({
+            'bbox': (x, y, w, h),
+            'row_lines': [y + r for r in row_lines],
+            'col_lines': [x + c for c in col_lines],
+        })
+
+    tables.sort(key=lambda t: (t['bbox'][1], t['bbox'][0]))
+    return tables
+
+
+def grid_cells(table: Dict[str, Any], pad: int = 4) -> List[Tuple[int, int, int, int, int, int]]:
+    """Cellules (ligne, colonne, x0, y0, x1, y1) d'une grille, filets exclus"""
+    cells = []
+    rows, cols = table['row_lines'], table['col_lines']
+    for i in range(len(rows) - 1):
+        for j in range(len(cols) - 1):
+            x0, x1 = cols[j] + pad, cols[j + 1] - pad
+            y0, y1 = rows[i] + pad, rows[i + 1] - pad
+            if x1 > x0 and y1 > y0:
+                cells.append((i, j, x0, y0, x1, y1))
+    return cells